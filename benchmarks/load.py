@@ -0,0 +1,197 @@
+"""
+Endpoint load test: drives main.app in process (httpx ASGI transport) against a seeded database and fakeredis.
+
+Every virtual user logs in once, then repeats create, get, list, search, upcoming birthdays, update and delete
+of its own contact. Prints JSON with throughput and p50/p95/p99 latency per route, so runs can be compared.
+
+Usage: python -m benchmarks.load --users 10 --iterations 20 --contacts 200 [--database-url URL] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date
+
+import fakeredis.aioredis
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from main import app
+from src.database.db import get_db
+from src.database.models import Base, Contact, User
+from src.repositories.hashing import get_hash, hash_pool
+from src.repositories.limiter import HybridRateLimiter
+from src.repositories.operations import contacts_cache
+
+PASSWORD = 'benchmark-password'
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+class Recorder:
+    """Latencies and status codes per route template."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str,
+                   **kwargs) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as err:
+            self.statuses[route][type(err).__name__] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - start)
+        self.statuses[route][str(response.status_code)] += 1
+        return response
+
+    def report(self, seconds: float) -> dict:
+        routes = {}
+        # routes whose calls all raised have statuses but no latencies, they are reported with count 0
+        for route in sorted(self.statuses.keys() | self.latencies.keys()):
+            values = sorted(self.latencies.get(route, []))
+            errors = sum(count for code, count in self.statuses[route].items()
+                         if not code.isdigit() or int(code) >= 500)
+            routes[route] = {
+                "count": len(values),
+                "errors": errors,
+                "statuses": dict(self.statuses[route]),
+                "rps": len(values) / seconds,
+                "mean_ms": sum(values) / len(values) * 1000 if values else None,
+                "p50_ms": percentile(values, 50) * 1000 if values else None,
+                "p95_ms": percentile(values, 95) * 1000 if values else None,
+                "p99_ms": percentile(values, 99) * 1000 if values else None,
+                "max_ms": values[-1] * 1000 if values else None,
+            }
+        total = sum(route["count"] for route in routes.values())
+        return {"seconds": seconds, "requests": total, "rps": total / seconds, "routes": routes}
+
+
+async def seed(session: async_sessionmaker, users: int, contacts: int) -> None:
+    password = get_hash(PASSWORD)
+    async with session() as db:
+        db.add_all(User(email=f'bench{number}@example.com', password=password, confirmed=True)
+                   for number in range(users))
+        await db.commit()
+        ids = (await db.execute(text('SELECT id FROM "Users" ORDER BY id'))).scalars().all()
+        for user_id in ids:
+            db.add_all(Contact(name=f'Name{number}', surname=f'Surname{number % 50}', email=f'c{number}@example.com',
+                               birthday=date(1990, 1 + number % 12, 1 + number % 28), data='notes', user=user_id)
+                       for number in range(contacts))
+        await db.commit()
+
+
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, number: int, iterations: int) -> None:
+    response = await recorder.call(client, 'POST /utils/login', 'POST', '/utils/login',
+                                   data={"username": f'bench{number}@example.com', "password": PASSWORD})
+    if response is None or response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for iteration in range(iterations):
+        name = f'Load{number}x{iteration}'
+        contact = {"name": name, "surname": "Load", "email": f'{name}@example.com', "birthday": "1990-05-05",
+                   "data": "notes"}
+        await recorder.call(client, 'POST /contacts/new_contatact', 'POST', '/contacts/new_contatact',
+                            json=contact, headers=headers)
+        await recorder.call(client, 'GET /contacts/get_contatact', 'GET', '/contacts/get_contatact',
+                            params={"name": name}, headers=headers)
+        await recorder.call(client, 'GET /contacts/get_all_contatact', 'GET', '/contacts/get_all_contatact',
+                            params={"limit": 50}, headers=headers)
+        await recorder.call(client, 'GET /utils/search', 'GET', '/utils/search',
+                            params={"param": f'Surname{iteration % 50}'}, headers=headers)
+        await recorder.call(client, 'GET /utils/upcoming_birthday', 'GET', '/utils/upcoming_birthday',
+                            params={"days": 30}, headers=headers)
+        await recorder.call(client, 'PUT /contacts/update_contatact', 'PUT', '/contacts/update_contatact',
+                            params={"name": name}, json={**contact, "surname": "Updated"}, headers=headers)
+        await recorder.call(client, 'DELETE /contacts/delete_contact', 'DELETE', '/contacts/delete_contact',
+                            params={"name": name}, headers=headers)
+
+
+def disable_rate_limits() -> None:
+    """Rate limits of 1-2 requests per client would turn the run into a 429 benchmark."""
+    for route in app.routes:
+        dependant = getattr(route, 'dependant', None)
+        for dependency in dependant.dependencies if dependant else []:
+            if isinstance(dependency.call, HybridRateLimiter):
+                app.dependency_overrides[dependency.call] = lambda: None
+
+
+def version() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        url = args.database_url or f'sqlite+aiosqlite:///{os.path.join(folder, "load.db")}'
+        engine = create_async_engine(url, connect_args={'timeout': 30} if url.startswith('sqlite') else {})
+        async with engine.begin() as conn:
+            if engine.dialect.name == 'postgresql':
+                await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        session = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        await seed(session, args.users, args.contacts)
+
+        async def override_get_db():
+            async with session() as db:
+                yield db
+
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        app.dependency_overrides[get_db] = override_get_db
+        HybridRateLimiter.init(redis)
+        contacts_cache.init(redis)
+        if not args.keep_rate_limits:
+            disable_rate_limits()
+
+        recorder = Recorder()
+        async with httpx.AsyncClient(app=app, base_url='http://bench') as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(virtual_user(client, recorder, number, args.iterations)
+                                   for number in range(args.users)))
+            seconds = time.perf_counter() - start
+        await engine.dispose()
+        hash_pool.shutdown()
+    return {
+        "version": version(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "users": args.users,
+        "iterations": args.iterations,
+        "contacts": args.contacts,
+        **recorder.report(seconds),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=20, help='scenario repeats per user')
+    parser.add_argument('--contacts', type=int, default=200, help='seeded contacts per user')
+    parser.add_argument('--database-url', help='async SQLAlchemy url, default is a temporary SQLite file')
+    parser.add_argument('--keep-rate-limits', action='store_true')
+    parser.add_argument('--output', help='write JSON report to file instead of stdout')
+    args = parser.parse_args()
+    report = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
@@ -0,0 +1,198 @@
+"""
+Microbenchmarks of auth and repository hot paths with stored baselines.
+
+Every benchmark is calibrated to run ROUND_TIME per round, the per call time of the fastest round
+is compared with benchmarks/baselines.json. The run fails (exit code 1) if a benchmark is slower than
+baseline * (1 + tolerance). Baselines depend on the machine, store them on the one that runs the check.
+
+Usage:
+    python -m benchmarks.micro --save                 # measure and store baselines
+    python -m benchmarks.micro                        # measure and check against baselines
+    python -m benchmarks.micro --tolerance 0.3 --sizes 10,1000 -k search
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from jose import jwt
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import undefer
+
+from src.database.models import Base, Contact, User
+from src.repositories import auth, operations
+from src.repositories.hashing import hash_pool
+from src.schemas import ContactResponse
+
+BASELINES = Path(__file__).parent / 'baselines.json'
+SIZES = (10, 1000, 100000)
+ROUND_TIME = 0.1
+ROUNDS = 7
+TOLERANCE = 0.3
+TODAY = date(2026, 1, 1)
+
+contact_list = TypeAdapter(list[ContactResponse])
+
+
+async def measure(func, rounds: int = ROUNDS) -> dict:
+    """
+    Time func (sync or coroutine function).
+
+    :return: min and median seconds per call, calls per round.
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    result = func()
+    is_async = inspect.isawaitable(result)
+    if is_async:
+        await result
+    number = max(1, int(ROUND_TIME / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if is_async:
+            for _ in range(number):
+                await func()
+        else:
+            for _ in range(number):
+                func()
+        times.append((time.perf_counter() - start) / number)
+    return {"min": min(times), "median": statistics.median(times), "number": number}
+
+
+async def seed(size: int, folder: str):
+    engine = create_async_engine(f'sqlite+aiosqlite:///{os.path.join(folder, f"micro{size}.db")}')
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session() as db:
+        user = User(email='micro@example.com', password=auth.Hash().get_password_hash('password'), confirmed=True)
+        db.add(user)
+        await db.commit()
+        await db.execute(insert(Contact), [
+            {"name": f'Name{number}', "surname": f'Surname{number % 50}', "email": f'c{number}@example.com',
+             "birthday": date(1990, 1 + number % 12, 1 + number % 28), "data": 'notes', "user": user.id}
+            for number in range(size)
+        ])
+        await db.commit()
+    return engine, session, user
+
+
+async def auth_benchmarks() -> dict:
+    """Benchmarks that don't depend on the number of contacts."""
+    token = await auth.create_access_token({"sub": 'micro@example.com'})
+    hashed = auth.Hash().get_password_hash('password')
+    auth.user_cache.set('micro@example.com', auth.UserSnapshot(id=1, email='micro@example.com', confirmed=True))
+    return {
+        'auth.create_access_token': lambda: auth.create_access_token({"sub": 'micro@example.com'}),
+        'jwt.decode': lambda: jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM]),
+        'auth.decode_token': lambda: auth.decode_token(token),
+        'auth.get_current_user': lambda: auth.get_current_user(token, None),
+        'Hash.verify_password': lambda: auth.Hash().verify_password('password', hashed),
+    }
+
+
+def repository_benchmarks(session, user) -> dict:
+    """Benchmarks over a database of one user's contacts."""
+    async def search():
+        async with session() as db:
+            await operations.search('Surname1', user, db)
+
+    async def upcoming_birthday():
+        async with session() as db:
+            await operations.upcoming_birthday(user, db, days=30, today=TODAY)
+
+    return {
+        'operations.search': search,
+        'operations.upcoming_birthday': upcoming_birthday,
+    }
+
+
+async def serialization_benchmark(session, user) -> dict:
+    async with session() as db:
+        result = await db.execute(select(Contact).options(undefer(Contact.data)).filter_by(user=user.id))
+        contacts = result.scalars().all()
+    return {
+        'ContactResponse serialization': lambda: contact_list.dump_json(
+            contact_list.validate_python(contacts, from_attributes=True)),
+    }
+
+
+async def run(sizes: tuple, keyword: str | None, rounds: int) -> dict:
+    results = {}
+
+    async def run_group(benchmarks: dict, suffix: str = ''):
+        for name, func in benchmarks.items():
+            key = name + suffix
+            if keyword and keyword not in key:
+                continue
+            results[key] = await measure(func, rounds)
+            print(f'{key:<50} {results[key]["min"] * 1e6:>14.1f} us', file=sys.stderr)
+
+    await run_group(await auth_benchmarks())
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            engine, session, user = await seed(size, folder)
+            await run_group(repository_benchmarks(session, user), f'[{size}]')
+            await run_group(await serialization_benchmark(session, user), f'[{size}]')
+            await engine.dispose()
+    hash_pool.shutdown()
+    return results
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> list:
+    """
+    Benchmarks slower than their baseline by more than tolerance.
+
+    :return: (name, baseline seconds, current seconds) of every regression.
+    :rtype: list
+    """
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline and result["min"] > baseline["min"] * (1 + tolerance):
+            regressions.append((name, baseline["min"], result["min"]))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', action='store_true', help='store results as new baselines')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed slowdown, 0.3 is 30%%')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='contacts in the database')
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('-k', dest='keyword', help='run only benchmarks containing this substring')
+    parser.add_argument('--baselines', type=Path, default=BASELINES)
+    args = parser.parse_args()
+    sizes = tuple(int(size) for size in args.sizes.split(','))
+    results = asyncio.run(run(sizes, args.keyword, args.rounds))
+    if args.save:
+        baselines = json.loads(args.baselines.read_text()) if args.baselines.exists() else {}
+        baselines.update(results)
+        args.baselines.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        print(f'Saved {len(results)} baselines to {args.baselines}', file=sys.stderr)
+        return 0
+    if not args.baselines.exists():
+        print(f'No baselines in {args.baselines}, run with --save first', file=sys.stderr)
+        return 1
+    regressions = compare(results, json.loads(args.baselines.read_text()), args.tolerance)
+    print(json.dumps({"tolerance": args.tolerance, "results": results,
+                      "regressions": [{"name": name, "baseline": baseline, "current": current}
+                                      for name, baseline, current in regressions]}, indent=2))
+    for name, baseline, current in regressions:
+        print(f'REGRESSION {name}: {baseline * 1e6:.1f} us -> {current * 1e6:.1f} us '
+              f'(+{(current / baseline - 1) * 100:.0f}%)', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
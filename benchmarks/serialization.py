@@ -0,0 +1,66 @@
+"""
+Contact list serialization benchmark: default path (ORM objects + jsonable_encoder + json)
+against the fast path (plain rows + ContactRow + orjson).
+
+Usage: python -m benchmarks.serialization --rows 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database.models import Base, Contact, User
+from src.repositories.operations import get_all_contacts
+
+
+async def seed(rows: int):
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with session() as db:
+        user = User(email='bench@example.com', password='x')
+        db.add(user)
+        await db.commit()
+        db.add_all(Contact(name=f'Name{number}', surname='Doe', email=f'doe{number}@example.com',
+                           birthday=date(1990, 1 + number % 12, 1 + number % 28), data='notes ' * 10, user=user.id)
+                   for number in range(rows))
+        await db.commit()
+    return engine, session, user
+
+
+async def measure(session, user, fast: bool, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        async with session() as db:
+            contacts = await get_all_contacts(user, db, fast=fast)
+        if fast:
+            ORJSONResponse(content=contacts)
+        else:
+            JSONResponse(content=jsonable_encoder(contacts))
+    return time.perf_counter() - start
+
+
+async def main(rows: int, repeat: int):
+    engine, session, user = await seed(rows)
+    await measure(session, user, False, 1)
+    await measure(session, user, True, 1)
+    default = await measure(session, user, False, repeat)
+    fast = await measure(session, user, True, repeat)
+    await engine.dispose()
+    print(f'rows={rows} repeat={repeat}')
+    print(f'default: {rows * repeat / default:,.0f} rows/s ({default / repeat * 1000:.2f} ms per response)')
+    print(f'fast:    {rows * repeat / fast:,.0f} rows/s ({fast / repeat * 1000:.2f} ms per response)')
+    print(f'speedup: {default / fast:.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -1,14 +1,21 @@
-import os
 
 from fastapi import FastAPI, status, Request
-from fastapi_limiter import FastAPILimiter
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import redis.asyncio as redis
 from dotenv import load_dotenv
 
 
+from src import metrics
+from src.database.db import engine
+from src.database.redis_pool import redis_pool
 from src.routers.routers import router, utils, users
+from src.repositories import auth
+from src.repositories.bulk import IMPORT_MAX_BYTES
+from src.repositories.email import mail_worker, templates
+from src.repositories.hashing import hash_pool
+from src.repositories.images import AVATAR_MAX_BYTES, UPLOAD_OVERHEAD, UploadLimitMiddleware, avatar_pipeline
+from src.repositories.limiter import HybridRateLimiter
+from src.repositories.operations import contacts_cache
 
 app = FastAPI()
 load_dotenv()
@@ -28,6 +35,30 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadLimitMiddleware, routes={("PATCH", "/users/avatar"): AVATAR_MAX_BYTES + UPLOAD_OVERHEAD,
+                                                  ("POST", "/contacts/import"): IMPORT_MAX_BYTES + UPLOAD_OVERHEAD})
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+for prefix, component in (('hash_pool', hash_pool), ('user_cache', auth.user_cache), ('token_cache', auth.token_cache),
+                          ('contacts_cache', contacts_cache), ('redis_pool', redis_pool),
+                          ('mail_worker', mail_worker), ('mail_templates', templates),
+                          ('avatar_pipeline', avatar_pipeline)):
+    metrics.registry.collect_stats(prefix, (), lambda component=component: [((), component.stats())])
+
+
+def rate_limiters():
+    """Stats of every HybridRateLimiter dependency, labelled by the route it guards"""
+    for route in app.routes:
+        dependant = getattr(route, 'dependant', None)
+        for dependency in dependant.dependencies if dependant else []:
+            if isinstance(dependency.call, HybridRateLimiter):
+                yield (route.path,), dependency.call.stats()
+
+
+metrics.registry.collect_stats('rate_limiter', ('route',), rate_limiters)
+
+
 @app.exception_handler(Exception)
 def unexpected_exception_handler(request: Request, exc: Exception):
     """Exception decorator"""
@@ -36,10 +67,26 @@ def unexpected_exception_handler(request: Request, exc: Exception):
         content={"message": "An unexpected error occurred"})
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus metrics: per-route latency and status codes, in-flight requests, pools, caches and workers"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.on_event("startup")
 async def startup():
-    """Redis plus FastapiLimiter"""
-    r = await redis.Redis(host=os.environ.get('REDIS_HOST'),
-                          port=os.environ.get('REDIS_PORT'), password=os.environ.get('REDIS_PASSWORD'),
-                          db=0, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(r)
\ No newline at end of file
+    """Shared Redis pool for rate limiter and contacts cache, mail templates and delivery workers"""
+    r = redis_pool.open()
+    await redis_pool.ping()
+    HybridRateLimiter.init(r)
+    contacts_cache.init(r)
+    templates.load()
+    mail_worker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Deliver queued mail, stop password hashing workers and close Redis connections"""
+    await mail_worker.stop()
+    hash_pool.shutdown()
+    await redis_pool.close()
@@ -0,0 +1,35 @@
+"""contacts_trgm_search_indexes
+
+Revision ID: 3f9c2a7d8e41
+Revises: ad954748e8af
+Create Date: 2026-10-18 10:12:04.512733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d8e41'
+down_revision = 'ad954748e8af'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('name', 'surname', 'email')
+
+
+def upgrade() -> None:
+    # pg_trgm GIN indexes let ILIKE '%param%' in operations.search use an index scan
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        op.create_index(f'ix_Contacts_{column}_trgm', 'Contacts', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f'ix_Contacts_{column}_trgm', table_name='Contacts')
@@ -0,0 +1,28 @@
+"""contacts_birthday_month_day_index
+
+Revision ID: 8b1d4e6f2c57
+Revises: 3f9c2a7d8e41
+Create Date: 2026-10-18 11:03:47.208196
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1d4e6f2c57'
+down_revision = '3f9c2a7d8e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Same month * 100 + day expression as Contact.birthday_md, so upcoming_birthday can use the index
+    birthday = sa.column('birthday', sa.Date)
+    month_day = (sa.cast(sa.extract('month', birthday), sa.Integer) * sa.literal_column('100', sa.Integer)
+                 + sa.cast(sa.extract('day', birthday), sa.Integer))
+    op.create_index('ix_Contacts_user_birthday_md', 'Contacts', [sa.column('user'), month_day], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_Contacts_user_birthday_md', table_name='Contacts')
@@ -0,0 +1,26 @@
+"""contacts_user_name_index
+
+Revision ID: c5e07a93b1f2
+Revises: 8b1d4e6f2c57
+Create Date: 2026-10-18 11:41:09.377015
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e07a93b1f2'
+down_revision = '8b1d4e6f2c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (user, name) serves get_one_contact / update_contact / del_contact lookups,
+    # trailing id serves the (name, id) keyset order of get_all_contacts and export
+    op.create_index('ix_Contacts_user_name_id', 'Contacts', ['user', 'name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_Contacts_user_name_id', table_name='Contacts')
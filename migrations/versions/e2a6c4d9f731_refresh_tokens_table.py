@@ -0,0 +1,39 @@
+"""refresh_tokens_table
+
+Revision ID: e2a6c4d9f731
+Revises: c5e07a93b1f2
+Create Date: 2026-10-18 15:02:47.118340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a6c4d9f731'
+down_revision = 'c5e07a93b1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('RefreshTokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('user', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user'], ['Users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token_hash')
+    )
+    op.create_index(op.f('ix_RefreshTokens_user'), 'RefreshTokens', ['user'], unique=False)
+    # tokens were never read back from Users, existing sessions just log in again
+    op.drop_column('Users', 'refresh_token')
+    op.drop_column('Users', 'access_token')
+
+
+def downgrade() -> None:
+    op.add_column('Users', sa.Column('access_token', sa.String(length=300), nullable=True))
+    op.add_column('Users', sa.Column('refresh_token', sa.String(length=300), nullable=True))
+    op.drop_index(op.f('ix_RefreshTokens_user'), table_name='RefreshTokens')
+    op.drop_table('RefreshTokens')
@@ -1,30 +1,27 @@
+import asyncio
+
 from faker import Faker
 from src.database.db import SESSION
 from src.database.models import Contact
 
 fake = Faker('uk-UA')
 
-def fill_db():
+async def fill_db():
     """Fill database with fake contacts for test"""
 
     flag = True
-    session = SESSION()
-    for db_new_object in range(5):
-        name = fake.name().split(' ')
-        if flag:
-            obj = Contact(name = name[0], surname =name[1], email = fake.email(), birthday = fake.date_of_birth(), data = info)
-            flag = False
-        else:
-            obj = Contact(name=name[0], surname=name[1], email=fake.email(), birthday=fake.date_of_birth())
-            flag = True
-        session.add(obj)
-        session.commit()
-
-
-
-
-
-
-
-
-
+    async with SESSION() as session:
+        for db_new_object in range(5):
+            name = fake.name().split(' ')
+            if flag:
+                obj = Contact(name = name[0], surname =name[1], email = fake.email(), birthday = fake.date_of_birth(), data = info)
+                flag = False
+            else:
+                obj = Contact(name=name[0], surname=name[1], email=fake.email(), birthday=fake.date_of_birth())
+                flag = True
+            session.add(obj)
+            await session.commit()
+
+
+if __name__ == '__main__':
+    asyncio.run(fill_db())
@@ -1,6 +1,5 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,15 +12,13 @@ DB_NAME = os.environ.get('DB_NAME')
 
 
 DB = f'postgresql+psycopg2://{DATABASE}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+ASYNC_DB = f'postgresql+asyncpg://{DATABASE}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
-engine = create_engine(DB)
+engine = create_async_engine(ASYNC_DB)
 
-SESSION = sessionmaker(autocommit = False, autoflush= False, bind= engine)
+SESSION = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
-def get_db():
+async def get_db():
     """Connection to database"""
-    db = SESSION()
-    try:
+    async with SESSION() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,9 +1,23 @@
-from sqlalchemy import Column, String, Date, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, String, Date, DateTime, Integer, ForeignKey, Boolean, Index, cast, extract, \
+    literal_column
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred
 
 
 Base = declarative_base()
 
+
+def month_day(column):
+    """
+    SQL expression month * 100 + day for a date column, e.g. 1231 for December 31.
+
+    100 is rendered inline, a bound parameter would make the query expression differ from the indexed one.
+    """
+    return (cast(extract('month', column), Integer) * literal_column('100', Integer)
+            + cast(extract('day', column), Integer))
+
+
 class Contact(Base):
 
     """Contact object model"""
@@ -14,9 +28,27 @@ class Contact(Base):
     surname = Column(String(100))
     email = Column(String(100))
     birthday = Column(Date)
-    data = Column(String(), default= None)
+    # unbounded notes are loaded only when asked for (get_one_contact or fields=data)
+    data = deferred(Column(String(), default= None))
     user = Column(ForeignKey("Users.id", ondelete="CASCADE"), nullable=True, default=None)
 
+    __table_args__ = tuple(
+        Index(f'ix_Contacts_{column}_trgm', column, postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+        for column in ('name', 'surname', 'email')
+    ) + (
+        Index('ix_Contacts_user_name_id', user, name, id),
+        Index('ix_Contacts_user_birthday_md', user, month_day(birthday)),
+    )
+
+    @hybrid_property
+    def birthday_md(self):
+        """Birthday as month * 100 + day, indexed together with user for upcoming birthday lookups."""
+        return self.birthday.month * 100 + self.birthday.day if self.birthday else None
+
+    @birthday_md.expression
+    def birthday_md(cls):
+        return month_day(cls.birthday)
+
 class User(Base):
 
     """User object model"""
@@ -25,10 +57,19 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     email = Column(String(50), nullable= False, unique= True)
     password = Column(String(), nullable= False)
-    access_token = Column(String(300), default=None)
-    refresh_token = Column(String(300), default=None)
     confirmed = Column(Boolean(), default=False)
     avatar = Column(String(255), nullable=True)
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+class RefreshToken(Base):
+
+    """Issued refresh token, stored as SHA-256 of the token. A row is deleted when the token is rotated."""
+
+    __tablename__ = 'RefreshTokens'
+    id = Column(Integer, primary_key=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    user = Column(ForeignKey("Users.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
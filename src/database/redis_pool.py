@@ -0,0 +1,184 @@
+import logging
+import os
+import time
+
+import redis.asyncio as redis
+from dotenv import load_dotenv
+from redis.asyncio.client import Pipeline
+from redis.asyncio.connection import BlockingConnectionPool
+from redis.exceptions import ConnectionError as RedisConnectionError, RedisError
+
+from src import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+REDIS_PASSWORD = os.environ.get('REDIS_PASSWORD')
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 20))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 2))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 1))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 1))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """Blocking pool that waits up to timeout for a free connection and counts waits and timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+        self.in_use = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def get_connection(self, command_name, *keys, **options):
+        start = time.perf_counter()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except RedisConnectionError:
+            self.timeouts += 1
+            raise
+        wait = time.perf_counter() - start
+        self.acquired += 1
+        self.in_use += 1
+        self.wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        return connection
+
+    async def release(self, connection):
+        self.in_use -= 1
+        await super().release(connection)
+
+    def stats(self) -> dict:
+        """
+        Pool metrics, counted on checkout and release only, not read from redis-py internals.
+
+        :return: pool size, connections checked out, waits and timeouts.
+        :rtype: dict
+        """
+        return {
+            "max_connections": self.max_connections,
+            "in_use": self.in_use,
+            "utilization": self.in_use / self.max_connections,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "avg_wait_seconds": self.wait_seconds / self.acquired if self.acquired else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+async def _timed(command: str, coroutine):
+    """Await a Redis call and record its latency, or the error, under the command name."""
+    start = time.perf_counter()
+    try:
+        return await coroutine
+    except RedisError:
+        metrics.redis_errors.inc((command,))
+        raise
+    finally:
+        metrics.redis_duration.observe((command,), time.perf_counter() - start)
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline that records one PIPELINE timing per round trip."""
+
+    async def execute(self, raise_on_error: bool = True):
+        return await _timed('PIPELINE', super().execute(raise_on_error))
+
+
+class InstrumentedRedis(redis.Redis):
+    """Client that records latency and errors of every command."""
+
+    async def execute_command(self, *args, **options):
+        return await _timed(str(args[0]).upper(), super().execute_command(*args, **options))
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class RedisPool:
+    """
+    App-wide Redis connection pool and client.
+
+    Opened once on startup and closed on shutdown, the rate limiter, caches and background jobs
+    all share its client instead of opening their own connections.
+    """
+
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT, password: str | None = REDIS_PASSWORD,
+                 max_connections: int = REDIS_MAX_CONNECTIONS, timeout: float = REDIS_POOL_TIMEOUT):
+        """
+        :param host: Redis host.
+        :type host: str
+        :param port: Redis port.
+        :type port: int
+        :param password: Redis password.
+        :type password: str
+        :param max_connections: max number of open connections.
+        :type max_connections: int
+        :param timeout: max seconds to wait for a free connection.
+        :type timeout: float
+        """
+        self.host = host
+        self.port = port
+        self.password = password
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.pool: InstrumentedConnectionPool | None = None
+        self.client: redis.Redis | None = None
+
+    def open(self, **kwargs) -> redis.Redis:
+        """
+        Create the pool and its client, connections are opened on demand.
+
+        :param kwargs: extra connection options, e.g. connection_class for tests.
+        :return: shared client.
+        :rtype: redis.Redis
+        """
+        if self.client is None:
+            options = dict(host=self.host, port=self.port, password=self.password, db=0,
+                           encoding="utf-8", decode_responses=True, socket_timeout=REDIS_SOCKET_TIMEOUT,
+                           socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                           health_check_interval=REDIS_HEALTH_CHECK_INTERVAL)
+            options.update(kwargs)
+            self.pool = InstrumentedConnectionPool(max_connections=self.max_connections, timeout=self.timeout,
+                                                   **options)
+            self.client = InstrumentedRedis(connection_pool=self.pool)
+        return self.client
+
+    async def ping(self) -> bool:
+        """
+        Check that Redis answers.
+
+        :return: True if Redis is reachable.
+        :rtype: bool
+        """
+        try:
+            return bool(await self.client.ping())
+        except RedisError as err:
+            logger.warning('Redis is not available: %s', err)
+            return False
+
+    async def close(self) -> None:
+        """Close the client and disconnect every pooled connection."""
+        if self.client is None:
+            return
+        await self.client.close()
+        await self.pool.disconnect()
+        self.client = None
+        self.pool = None
+
+    def stats(self) -> dict:
+        """
+        Pool metrics.
+
+        :return: pool utilization, waits and timeouts, empty if the pool is not open.
+        :rtype: dict
+        """
+        return self.pool.stats() if self.pool is not None else {}
+
+
+redis_pool = RedisPool()
@@ -0,0 +1,212 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """Base of in-process metrics rendered in Prometheus text format."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        :param name: metric name.
+        :type name: str
+        :param documentation: HELP text.
+        :type documentation: str
+        :param labelnames: label names, values are passed as a tuple in the same order.
+        :type labelnames: tuple
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict = {}
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {value}'
+
+    def render(self) -> str:
+        header = f'# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n'
+        return header + ''.join(line + '\n' for line in self.samples())
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple = (), value: float = 0) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels: tuple, value: float) -> None:
+        """
+        Add one observation.
+
+        :param labels: label values.
+        :type labels: tuple
+        :param value: observed value, e.g. seconds.
+        :type value: float
+        """
+        item = self._values.get(labels)
+        if item is None:
+            item = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        item[0][bisect_left(self.buckets, value)] += 1
+        item[1] += value
+        item[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {total}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {count}'
+
+
+class Registry:
+    """Metrics plus collectors, which turn component stats() into gauges when /metrics is scraped."""
+
+    def __init__(self):
+        self.metrics: list[Metric] = []
+        self.collectors: list[tuple[str, tuple, Callable[[], Iterable[tuple[tuple, dict]]]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def collect_stats(self, prefix: str, labelnames: tuple, collect: Callable[[], Iterable[tuple[tuple, dict]]]):
+        """
+        Expose numeric values of stats() dicts as gauges named <prefix>_<key>.
+
+        :param prefix: metric name prefix, e.g. 'hash_pool'.
+        :type prefix: str
+        :param labelnames: label names of the collected rows.
+        :type labelnames: tuple
+        :param collect: returns (label values, stats dict) rows.
+        """
+        self.collectors.append((prefix, labelnames, collect))
+
+    def render(self) -> str:
+        """
+        All metrics in Prometheus text exposition format.
+
+        :return: metrics text.
+        :rtype: str
+        """
+        parts = [metric.render() for metric in self.metrics]
+        for prefix, labelnames, collect in self.collectors:
+            gauges: dict[str, Gauge] = {}
+            for labels, stats in collect():
+                for key, value in stats.items():
+                    if isinstance(value, (int, float)):
+                        name = f'{prefix}_{key}'
+                        gauge = gauges.setdefault(name, Gauge(name, f'{prefix} stats {key}', labelnames))
+                        gauge.set(labels, float(value))
+            parts.extend(gauge.render() for gauge in gauges.values())
+        return ''.join(parts)
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by route template and status code.', ('method', 'route', 'status')))
+http_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template.', ('method', 'route')))
+http_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests being served.', ('method',)))
+db_checkouts = registry.register(Counter(
+    'db_pool_checkouts_total', 'Connections checked out of the database pool.'))
+db_checked_out = registry.register(Gauge(
+    'db_pool_checked_out', 'Database connections currently checked out.'))
+redis_duration = registry.register(Histogram(
+    'redis_command_duration_seconds', 'Redis command latency by command.', ('command',), REDIS_BUCKETS))
+redis_errors = registry.register(Counter(
+    'redis_command_errors_total', 'Failed Redis commands by command.', ('command',)))
+
+
+def instrument_engine(engine) -> None:
+    """Count checkouts of an SQLAlchemy (async) engine pool."""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        db_checkouts.inc()
+        db_checked_out.inc()
+
+    @event.listens_for(sync_engine, 'checkin')
+    def checkin(dbapi_connection, connection_record):
+        db_checked_out.dec()
+
+
+def route_template(scope: dict) -> str:
+    """Route path template set by FastAPI routing, e.g. '/users/avatars/{name}', never the raw path."""
+    route = scope.get('route')
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records latency, status code and in-flight count of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        method = scope['method']
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        http_in_flight.inc((method,))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope)
+            http_duration.observe((method, route), time.perf_counter() - start)
+            http_requests.inc((method, route, str(status_code)))
+            http_in_flight.dec((method,))
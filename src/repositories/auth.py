@@ -1,23 +1,29 @@
+import hashlib
 import os
+import time
+import uuid
 from _datetime import datetime
 from datetime import timedelta
+from dataclasses import dataclass
 from typing import Optional
 
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
 from src.database.db import get_db
-from src.database.models import User
+from src.database.models import RefreshToken, User
+from src.repositories.cache import TTLCache
+from src.repositories.hashing import hash_pool, pwd_context
 
 
 class Hash:
     """ User authentication class"""
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -43,24 +49,110 @@ class Hash:
         """
         return self.pwd_context.hash(password)
 
+    async def verify_password_async(self, plain_password, hashed_password):
+        """
+        Verify password in the hash pool, without blocking the event loop.
+
+        :param plain_password: password entered by the user.
+        :type plain_password: str
+        :param hashed_password: user password transformed in hash.
+        :type hashed_password: str
+        :return: True or False
+        :rtype: Bool
+        """
+        return await hash_pool.verify(plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str):
+        """
+        Transformed password in hash in the hash pool, without blocking the event loop.
+
+        :param password: user password.
+        :type password: str
+        :return: user password transformed in hash.
+        :rtype: str
+        """
+        return await hash_pool.get_hash(password)
+
 load_dotenv()
 SECRET_KEY = os.environ.get('SECRET_KEY')
 ALGORITHM = os.environ.get('ALGORITHM')
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 4096))
+TOKEN_CACHE_TTL = float(os.environ.get('TOKEN_CACHE_TTL', 300))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/utils/login")
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Lightweight detached copy of User, safe to keep in cache between requests."""
+
+    id: int
+    email: str
+    avatar: Optional[str] = None
+    confirmed: Optional[bool] = False
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(id=user.id, email=user.email, avatar=user.avatar, confirmed=user.confirmed)
+
+    def __str__(self):
+        return self.email
+
+
+# Cache is per process, so TTL bounds staleness for changes made by other workers
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(email: str) -> None:
+    """
+    Drop user snapshot from cache. Call it after every change of the Users row.
+
+    :param email: user email.
+    :type email: str
+    """
+    user_cache.invalidate(email)
+
+
+# Verified claims keyed by token digest, an entry never outlives token "exp"
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify token signature and return its claims. Claims of already verified tokens are taken from cache.
+
+    :param token: JWT token.
+    :type token: str
+    :return: token payload.
+    :rtype: dict
+    :raise JWTError: if token is invalid or expired.
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    exp = payload.get('exp')
+    if exp is not None:
+        token_cache.set(digest, payload, ttl=exp - time.time())
+    return payload
+
+
+
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """
     Search and return user object from database.
 
     :param email: user email.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User objects | None
     """
-    return db.query(User).filter_by(email = email).first()
+    result = await db.execute(select(User).filter_by(email = email))
+    return result.scalars().first()
 
 async def create_access_token(data: dict, expires_delta: Optional[float] = None):
     """
@@ -100,7 +192,8 @@ async def create_refresh_token(data: dict, expires_delta: Optional[float] = None
         expire = datetime.utcnow() + timedelta(seconds=expires_delta)
     else:
         expire = datetime.utcnow() + timedelta(days=7)
-    to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
+    # jti keeps tokens issued in the same second distinct, their hashes are unique in RefreshTokens
+    to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token", "jti": uuid.uuid4().hex})
     encoded_refresh_token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_refresh_token
 
@@ -115,7 +208,7 @@ async def get_email_form_refresh_token(refresh_token: str):
     :rtype: str
     """
     try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(refresh_token)
         if payload['scope'] == 'refresh_token':
             email = payload['sub']
             return email
@@ -124,15 +217,16 @@ async def get_email_form_refresh_token(refresh_token: str):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """
     We get user email from payload "scope", then try to find user in database.
 
     :param token: user access token, wich depends on OAuth2Sheme.
     :type token: str
     :param db: The database session.
-    :type db: Session
-    :return: User objects
+    :type db: AsyncSession
+    :return: cached snapshot of User
+    :rtype: UserSnapshot
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -141,7 +235,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         if payload['scope'] == 'access_token':
             email = payload["sub"]
             if email is None:
@@ -151,10 +245,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError as e:
         raise credentials_exception
 
-    user: User = db.query(User).filter_by(email = email).first()
+    snapshot = user_cache.get(email)
+    if snapshot is not None:
+        return snapshot
+    user: User = await get_user_by_email(email, db)
     if user is None:
         raise credentials_exception
-    return user
+    snapshot = UserSnapshot.from_user(user)
+    user_cache.set(email, snapshot)
+    return snapshot
 
 
 async def decode_refresh_token(self, refresh_token: str):
@@ -175,20 +274,54 @@ async def decode_refresh_token(self, refresh_token: str):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+def hash_token(token: str) -> str:
+    """SHA-256 of a token, only hashes are stored in RefreshTokens."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def issue_refresh_token(user_id: int, email: str, db: AsyncSession) -> str:
     """
-    Create a new refresh token for user.
+    Create refresh token and store its hash, expired tokens of the user are dropped in the same transaction.
+
+    :param user_id: user id.
+    :type user_id: int
+    :param email: user email.
+    :type email: str
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: user refresh token
+    :rtype: str
+    """
+    token = await create_refresh_token(data={"sub": email})
+    now = datetime.utcnow()
+    await db.execute(delete(RefreshToken).where(RefreshToken.user == user_id, RefreshToken.expires_at <= now))
+    db.add(RefreshToken(token_hash=hash_token(token), user=user_id, expires_at=now + timedelta(days=7)))
+    await db.commit()
+    return token
+
+
+async def rotate_refresh_token(token: str, db: AsyncSession) -> tuple[str, str]:
+    """
+    Exchange refresh token for a new one. The old token is deleted, so every refresh token works once.
 
-    :param user: current user.
-    :type user: User object
     :param token: user refresh token.
     :type token: str
     :param db: The database session.
-    :type db: Session
-    :return: None
+    :type db: AsyncSession
+    :return: user email and new refresh token.
+    :rtype: tuple
     """
-    user.refresh_token = token
-    db.commit()
+    email = await get_email_form_refresh_token(token)
+    result = await db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.token_hash == hash_token(token), RefreshToken.expires_at > datetime.utcnow())
+        .returning(RefreshToken.user)
+    )
+    user_id = result.scalar_one_or_none()
+    if user_id is None:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid refresh token')
+    return email, await issue_refresh_token(user_id, email, db)
 
 async def create_email_token(data: dict):
     """
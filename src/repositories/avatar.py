@@ -1,12 +1,5 @@
-import cloudinary
 from pydantic_settings import BaseSettings
 
-cloudinary.config(
-    cloud_name="dsjusqa4p",
-    api_key="599877185773136",
-    api_secret="VFeBRMltUi1d8Jz_aCwOGLF4b8k"
-)
-
 
 
 
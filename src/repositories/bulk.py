@@ -0,0 +1,202 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from typing import AsyncIterator, BinaryIO, Iterator, Sequence
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Contact, User
+from src.repositories.operations import contacts_cache
+from src.schemas import ContactModel
+
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', 10 * 1024 * 1024))
+EXPORT_FIELDS = ('id', 'name', 'surname', 'email', 'birthday', 'data')
+
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Sequence]:
+    """
+    Read all contacts of current user through a server side cursor, batch by batch.
+
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param batch_size: number of rows fetched from the cursor at once.
+    :type batch_size: int
+    :return: async iterator over batches of rows (id, name, surname, email, birthday, data).
+    """
+    query = select(*(getattr(Contact, field) for field in EXPORT_FIELDS))\
+        .filter_by(user=user.id).order_by(Contact.name, Contact.id)\
+        .execution_options(yield_per=batch_size)
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        yield rows
+
+
+async def to_ndjson(batches: AsyncIterator[Sequence]) -> AsyncIterator[str]:
+    """
+    Encode batches of contact rows as NDJSON, one chunk per batch.
+
+    :param batches: batches from stream_contacts.
+    :return: async iterator over text chunks.
+    """
+    async for rows in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + '\n' for row in rows)
+
+
+async def to_csv(batches: AsyncIterator[Sequence]) -> AsyncIterator[str]:
+    """
+    Encode batches of contact rows as CSV with a header line, one chunk per batch.
+
+    :param batches: batches from stream_contacts.
+    :return: async iterator over text chunks.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def read_rows(file: BinaryIO, fmt: str) -> Iterator[tuple[int, dict | Exception]]:
+    """
+    Read uploaded NDJSON or CSV file line by line.
+
+    :param file: binary file object of the upload.
+    :type file: BinaryIO
+    :param fmt: 'ndjson' or 'csv'.
+    :type fmt: str
+    :return: iterator over (line number, row dict or parse error).
+    """
+    if fmt == 'csv':
+        decode_errors = []
+        reader = csv.DictReader(_decode_lines(file, decode_errors))
+        for row in reader:
+            yield from decode_errors
+            decode_errors.clear()
+            yield reader.line_num, row
+        yield from decode_errors
+        return
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line.decode('utf-8'))
+            if not isinstance(row, dict):
+                raise ValueError('Row must be a JSON object')
+            yield number, row
+        except ValueError as err:
+            yield number, err
+
+
+def _decode_lines(file: BinaryIO, errors: list) -> Iterator[str]:
+    """Decode upload line by line, a line that is not valid UTF-8 is reported in errors and read as an empty one."""
+    for number, line in enumerate(file, start=1):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError as err:
+            errors.append((number, err))
+            yield '\n'
+
+
+def _error_message(err: Exception) -> str:
+    if isinstance(err, ValidationError):
+        return '; '.join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in err.errors())
+    return str(err)
+
+
+class ImportReport:
+    """Counters and per-row errors of one import, errors list is capped by IMPORT_MAX_ERRORS."""
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, number: int, err: Exception | str) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": number, "error": err if isinstance(err, str) else _error_message(err)})
+
+
+async def _insert_chunk(chunk: list[tuple[int, dict]], db: AsyncSession, report: ImportReport) -> None:
+    """
+    Insert one chunk with a single executemany INSERT in its own transaction.
+
+    If the chunk fails, its rows are inserted again one by one, so only the rows the database rejects are reported.
+    """
+    try:
+        await db.execute(insert(Contact), [values for _, values in chunk])
+        await db.commit()
+        report.imported += len(chunk)
+    except SQLAlchemyError as err:
+        await db.rollback()
+        if len(chunk) > 1:
+            for row in chunk:
+                await _insert_chunk([row], db, report)
+            return
+        report.error(chunk[0][0], str(getattr(err, 'orig', None) or err))
+
+
+async def import_contacts(rows: Iterator[tuple[int, dict | Exception]], user: User, db: AsyncSession,
+                          chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Validate rows against ContactModel and insert them chunk by chunk.
+    Parsing and validation are synchronous, so the event loop gets a turn after every chunk_size rows read.
+
+    :param rows: iterator from read_rows.
+    :param user: The user to import contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param chunk_size: number of rows per INSERT and per transaction.
+    :type chunk_size: int
+    :return: report with imported and failed counts, per-row errors and throughput.
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    report = ImportReport()
+    chunk = []
+    for read, (number, row) in enumerate(rows, start=1):
+        if read % chunk_size == 0:
+            await asyncio.sleep(0)
+        if isinstance(row, Exception):
+            report.error(number, row)
+            continue
+        try:
+            contact = ContactModel.model_validate(row)
+        except ValidationError as err:
+            report.error(number, err)
+            continue
+        chunk.append((number, {**contact.model_dump(), "user": user.id}))
+        if len(chunk) >= chunk_size:
+            await _insert_chunk(chunk, db, report)
+            chunk = []
+    if chunk:
+        await _insert_chunk(chunk, db, report)
+    if report.imported:
+        await contacts_cache.bump(user.id)
+    seconds = time.perf_counter() - start
+    return {
+        "imported": report.imported,
+        "failed": report.failed,
+        "errors": report.errors,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(report.imported / seconds, 1) if seconds else None,
+    }
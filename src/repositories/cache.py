@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded in-process LRU cache, every entry lives until its TTL runs out."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        """
+        :param maxsize: max number of entries, the least recently used one is dropped first.
+        :type maxsize: int
+        :param ttl: default entry lifetime in seconds.
+        :type ttl: float
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get value from cache.
+
+        :param key: cache key.
+        :return: cached value or None if key is missing or expired.
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expire = item
+        if expire <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Put value in cache.
+
+        :param key: cache key.
+        :param value: value to store.
+        :param ttl: entry lifetime in seconds. Default is cache ttl.
+        :type ttl: float
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop one entry from cache."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all entries from cache."""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """
+        Cache metrics.
+
+        :return: size, hits, misses and hit ratio.
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class VersionedRedisCache:
+    """
+    Read-through Redis cache with a per-owner version token.
+
+    Every entry key contains the owner's current version, writers replace the version after commit,
+    so entries written before a change can never be read again and just expire by TTL.
+    Versions are random tokens, never counters, so a lost or evicted version key can't bring old entries back.
+    Without Redis (not initialized or unavailable) every read goes straight to the loader.
+    """
+
+    def __init__(self, prefix: str, ttl: int = 300):
+        """
+        :param prefix: key prefix, e.g. 'contacts'.
+        :type prefix: str
+        :param ttl: entry lifetime in seconds.
+        :type ttl: int
+        """
+        self.prefix = prefix
+        self.ttl = ttl
+        self.redis = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def init(self, redis) -> None:
+        """Attach redis.asyncio client, created on app startup."""
+        self.redis = redis
+
+    def _version_key(self, owner: Hashable) -> str:
+        return f'{self.prefix}:version:{owner}'
+
+    async def version(self, owner: Hashable) -> str:
+        """
+        Current version token of the owner, a new one is created if there is none.
+
+        :param owner: owner id, e.g. user id.
+        :return: version token.
+        :rtype: str
+        """
+        key = self._version_key(owner)
+        version = await self.redis.get(key)
+        if version is None:
+            await self.redis.set(key, uuid.uuid4().hex, nx=True)
+            version = await self.redis.get(key)
+        return version
+
+    async def get_or_load(self, owner: Hashable, name: str, params: tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return cached result or call loader and cache its JSON encoded result.
+
+        :param owner: owner id, e.g. user id.
+        :param name: cached function name.
+        :type name: str
+        :param params: function parameters that change the result.
+        :type params: tuple
+        :param loader: coroutine function that reads result from database.
+        :return: loader result, or its JSON decoded copy on cache hit.
+        """
+        if self.redis is None:
+            return await loader()
+        try:
+            version = await self.version(owner)
+            digest = hashlib.sha1(json.dumps(params, default=str).encode()).hexdigest()
+            key = f'{self.prefix}:{owner}:{version}:{name}:{digest}'
+            cached = await self.redis.get(key)
+        except RedisError as err:
+            self.errors += 1
+            logger.warning('Redis cache read failed: %s', err)
+            return await loader()
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+        self.misses += 1
+        result = await loader()
+        try:
+            await self.redis.set(key, json.dumps(jsonable_encoder(result)), ex=self.ttl)
+        except RedisError as err:
+            self.errors += 1
+            logger.warning('Redis cache write failed: %s', err)
+        return result
+
+    async def etag(self, owner: Hashable, name: str, params: tuple) -> Optional[str]:
+        """
+        Entity tag of a cached read, changes together with owner's version.
+
+        :param owner: owner id, e.g. user id.
+        :param name: cached function name.
+        :type name: str
+        :param params: function parameters that change the result.
+        :type params: tuple
+        :return: quoted ETag or None if Redis is not available.
+        :rtype: str | None
+        """
+        if self.redis is None:
+            return None
+        try:
+            version = await self.version(owner)
+        except RedisError as err:
+            self.errors += 1
+            logger.warning('Redis cache read failed: %s', err)
+            return None
+        digest = hashlib.sha1(json.dumps([version, name, params], default=str).encode()).hexdigest()
+        return f'"{digest}"'
+
+    async def bump(self, owner: Hashable) -> None:
+        """
+        Replace owner's version, call it after every committed write.
+
+        :param owner: owner id, e.g. user id.
+        """
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self._version_key(owner), uuid.uuid4().hex)
+        except RedisError as err:
+            self.errors += 1
+            logger.error('Redis cache invalidation failed, entries stay until TTL: %s', err)
+
+    def stats(self) -> dict:
+        """
+        Cache metrics.
+
+        :return: hits, misses, errors and hit ratio.
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
@@ -1,12 +1,14 @@
 import os
+from email.message import EmailMessage
 from pathlib import Path
 
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import BaseModel, EmailStr
-from fastapi_mail import ConnectionConfig, MessageType, MessageSchema, FastMail
+from fastapi_mail import ConnectionConfig
 from dotenv import load_dotenv
 
 from src.repositories import auth as auth
+from src.repositories.mailer import MailWorker
+from src.repositories.rendering import TemplateRegistry
 
 
 load_dotenv()
@@ -31,25 +33,36 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
 )
 
+mail_worker = MailWorker(conf)
+templates = TemplateRegistry(conf.TEMPLATE_FOLDER)
+
+
 async def send_email(email: EmailStr,  host: str = HOST):
     """
-    Function create an email token, then we try to send message on user email.
+    Function create an email token, then queue confirmation message to user email.
 
     :param email: user email.
     :type email: string
     :param host: our host.
     :type host: str
     """
-    try:
-        token_verification = await auth.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="example_email.html")
-    except ConnectionErrors as err:
-        print(err)
\ No newline at end of file
+    await send_emails([email], host)
+
+
+async def send_emails(emails: list[EmailStr], host: str = HOST):
+    """
+    Bulk version of send_email, all bodies are rendered in one pass.
+
+    :param emails: users emails.
+    :type emails: list
+    :param host: our host.
+    :type host: str
+    """
+    contexts = [{"token": await auth.create_email_token({"sub": email})} for email in emails]
+    bodies = templates.render_many("example_email.html", contexts, host=host)
+    for email, body in zip(emails, bodies):
+        message = EmailMessage()
+        message["Subject"] = "Confirm your email "
+        message["To"] = email
+        message.set_content(body, subtype="html")
+        await mail_worker.send(message)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+load_dotenv()
+
+HASH_EXECUTOR = os.environ.get('HASH_EXECUTOR', 'thread')
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', 4))
+HASH_QUEUE_SIZE = int(os.environ.get('HASH_QUEUE_SIZE', 64))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _timed(func, *args):
+    """Run func inside the worker and return its result with the pure CPU time spent."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def verify(plain_password: str, hashed_password: str) -> bool:
+    """Module level bcrypt verify, so it can be pickled for a process pool."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_hash(password: str) -> str:
+    """Module level bcrypt hash, so it can be pickled for a process pool."""
+    return pwd_context.hash(password)
+
+
+class HashPool:
+    """Bounded executor for bcrypt work, keeps password hashing off the event loop."""
+
+    def __init__(self, kind: str = HASH_EXECUTOR, workers: int = HASH_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        """
+        :param kind: 'thread' or 'process'.
+        :type kind: str
+        :param workers: number of pool workers.
+        :type workers: int
+        :param queue_size: max number of password operations waiting or running at once.
+        :type queue_size: int
+        """
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Executor | None = None
+        self.depth = 0
+        self.max_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.total_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        """Create the executor on first use."""
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hash')
+        return self._executor
+
+    async def run(self, func, *args):
+        """
+        Run a password function in the pool.
+
+        :param func: module level function to call.
+        :param args: function arguments.
+        :return: function result.
+        :raise HTTPException: 503 if the queue is full.
+        """
+        if self.depth >= self.queue_size:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many login attempts, try again later")
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self.executor, _timed, func, *args)
+        finally:
+            self.depth -= 1
+        self.completed += 1
+        self.hash_seconds += elapsed
+        self.max_hash_seconds = max(self.max_hash_seconds, elapsed)
+        self.total_seconds += time.perf_counter() - start
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify password in the pool."""
+        return await self.run(verify, plain_password, hashed_password)
+
+    async def get_hash(self, password: str) -> str:
+        """Hash password in the pool."""
+        return await self.run(get_hash, password)
+
+    def stats(self) -> dict:
+        """
+        Pool metrics.
+
+        :return: queue depth and hash timings.
+        :rtype: dict
+        """
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.depth,
+            "max_queue_depth": self.max_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_seconds_total": self.hash_seconds,
+            "hash_seconds_max": self.max_hash_seconds,
+            "hash_seconds_avg": self.hash_seconds / self.completed if self.completed else 0.0,
+            "wait_seconds_total": self.total_seconds - self.hash_seconds,
+        }
+
+    def shutdown(self) -> None:
+        """Stop pool workers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hash_pool = HashPool()
@@ -0,0 +1,293 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import cloudinary
+import cloudinary.uploader
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+load_dotenv()
+
+AVATAR_SIZE = 250
+AVATAR_MAX_BYTES = int(os.environ.get('AVATAR_MAX_BYTES', 5 * 1024 * 1024))
+AVATAR_MAX_PIXELS = int(os.environ.get('AVATAR_MAX_PIXELS', 40_000_000))
+AVATAR_QUALITY = int(os.environ.get('AVATAR_QUALITY', 85))
+READ_CHUNK_SIZE = 64 * 1024
+AVATAR_STORAGE = os.environ.get('AVATAR_STORAGE', 'cloudinary')
+AVATAR_DIR = os.environ.get('AVATAR_DIR', 'media/avatars')
+AVATAR_URL = os.environ.get('AVATAR_URL', '/users/avatars')
+
+UPLOAD_OVERHEAD = 16 * 1024
+
+cloudinary.config(
+    cloud_name=os.environ.get('CLOUDINARY_NAME'),
+    api_key=os.environ.get('CLOUDINARY_API_KEY'),
+    api_secret=os.environ.get('CLOUDINARY_API_SECRET'),
+    secure=True
+)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that rejects too big request bodies of upload routes before they are parsed.
+
+    FastAPI reads the whole multipart form before the endpoint and its dependencies run, so read_limited
+    alone would still receive and spool the full file. Here a Content-Length over the limit is answered
+    with 413 without reading the body, and a body without Content-Length is counted while it is read.
+    """
+
+    def __init__(self, app, routes: dict[tuple[str, str], int]):
+        """
+        :param app: ASGI app.
+        :param routes: max body size in bytes by (method, path), e.g. {('PATCH', '/users/avatar'): limit}.
+        :type routes: dict
+        """
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        limit = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope['headers']).get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": f"Request body is bigger than {limit} bytes"},
+                                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                        detail=f"Request body is bigger than {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def read_limited(file: UploadFile, limit: int = AVATAR_MAX_BYTES) -> bytes:
+    """
+    Read upload in chunks and stop as soon as it is bigger than limit.
+
+    :param file: uploaded file.
+    :type file: UploadFile
+    :param limit: max size in bytes.
+    :type limit: int
+    :return: file content.
+    :rtype: bytes
+    """
+    buffer = bytearray()
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Avatar is bigger than {limit} bytes")
+    return bytes(buffer)
+
+
+def resize_avatar(data: bytes, size: int = AVATAR_SIZE, quality: int = AVATAR_QUALITY) -> bytes:
+    """
+    Crop image to a size x size square (same as Cloudinary crop='fill') and re-encode it as JPEG.
+
+    :param data: original image.
+    :type data: bytes
+    :param size: side of the square in pixels.
+    :type size: int
+    :param quality: JPEG quality.
+    :type quality: int
+    :return: resized JPEG.
+    :rtype: bytes
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > AVATAR_MAX_PIXELS:
+            raise ValueError(f"Image is bigger than {AVATAR_MAX_PIXELS} pixels")
+        image.draft('RGB', (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image.convert('RGB'), (size, size), Image.LANCZOS)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as err:
+        raise ValueError(f"Not an image: {err}") from err
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=quality, optimize=True)
+    return out.getvalue()
+
+
+class AvatarStorage(ABC):
+    """Where avatars are kept. save() is blocking and always runs in a thread."""
+
+    name = 'base'
+
+    @abstractmethod
+    def save(self, data: bytes, public_id: str) -> str:
+        """
+        Store resized avatar.
+
+        :param data: JPEG image.
+        :type data: bytes
+        :param public_id: stable id of the avatar owner, e.g. 'ContactApp/<email>'.
+        :type public_id: str
+        :return: avatar url.
+        :rtype: str
+        """
+
+    def stats(self) -> dict:
+        return {"storage": self.name}
+
+
+class CloudinaryStorage(AvatarStorage):
+    """Avatars on Cloudinary, one image per user overwritten on every upload."""
+
+    name = 'cloudinary'
+
+    def save(self, data: bytes, public_id: str) -> str:
+        r = cloudinary.uploader.upload(data, public_id=public_id, overwrite=True)
+        return cloudinary.CloudinaryImage(public_id).build_url(width=AVATAR_SIZE, height=AVATAR_SIZE, crop='fill',
+                                                               version=r.get('version'))
+
+
+class LocalStorage(AvatarStorage):
+    """
+    Content-addressed avatars on local disk (or a mounted object store).
+
+    File name is the SHA-256 of the image, so identical uploads are stored once
+    and a file never changes after it is written, which lets clients cache it forever.
+    """
+
+    name = 'local'
+
+    def __init__(self, root: str | Path = AVATAR_DIR, base_url: str = AVATAR_URL):
+        """
+        :param root: avatars folder.
+        :type root: str | Path
+        :param base_url: url prefix the avatars are served from.
+        :type base_url: str
+        """
+        self.root = Path(root)
+        self.base_url = base_url.rstrip('/')
+        self.stored = 0
+        self.deduplicated = 0
+
+    def path(self, name: str) -> Path:
+        """
+        File path of an avatar.
+
+        :param name: '<sha256>.jpg' file name.
+        :type name: str
+        :return: path in a two-letter fan-out folder.
+        :rtype: Path
+        """
+        return self.root / name[:2] / name
+
+    def save(self, data: bytes, public_id: str) -> str:
+        name = hashlib.sha256(data).hexdigest() + '.jpg'
+        path = self.path(name)
+        if path.exists():
+            self.deduplicated += 1
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp, path)
+            self.stored += 1
+        return f'{self.base_url}/{name}'
+
+    def stats(self) -> dict:
+        return {"storage": self.name, "stored": self.stored, "deduplicated": self.deduplicated}
+
+
+def make_storage(kind: str = AVATAR_STORAGE) -> AvatarStorage:
+    """
+    Storage backend by name.
+
+    :param kind: 'cloudinary' or 'local'.
+    :type kind: str
+    :return: storage backend.
+    :rtype: AvatarStorage
+    """
+    if kind == 'cloudinary':
+        return CloudinaryStorage()
+    if kind == 'local':
+        return LocalStorage()
+    raise ValueError(f"Unknown avatar storage: {kind}")
+
+
+class AvatarPipeline:
+    """Avatar upload: size limited read, resize in a thread, save to storage in a thread. The event loop never blocks."""
+
+    def __init__(self, storage: AvatarStorage):
+        """
+        :param storage: avatar storage backend.
+        :type storage: AvatarStorage
+        """
+        self.storage = storage
+        self.uploads = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.resize_seconds = 0.0
+        self.upload_seconds = 0.0
+
+    async def process(self, file: UploadFile, public_id: str) -> str:
+        """
+        Resize and upload new avatar.
+
+        :param file: uploaded image.
+        :type file: UploadFile
+        :param public_id: stable id of the avatar owner.
+        :type public_id: str
+        :return: avatar url.
+        :rtype: str
+        """
+        try:
+            data = await read_limited(file)
+            start = time.perf_counter()
+            resized = await run_in_threadpool(resize_avatar, data)
+        except ValueError as err:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+        except HTTPException:
+            self.rejected += 1
+            raise
+        uploaded = time.perf_counter()
+        url = await run_in_threadpool(self.storage.save, resized, public_id)
+        self.resize_seconds += uploaded - start
+        self.upload_seconds += time.perf_counter() - uploaded
+        self.uploads += 1
+        self.bytes_in += len(data)
+        self.bytes_out += len(resized)
+        return url
+
+    def stats(self) -> dict:
+        """
+        Avatar upload metrics.
+
+        :return: uploads, rejected files, bytes before and after resize, average resize and upload time, storage stats.
+        :rtype: dict
+        """
+        return {
+            **self.storage.stats(),
+            "uploads": self.uploads,
+            "rejected": self.rejected,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "avg_resize_seconds": self.resize_seconds / self.uploads if self.uploads else 0.0,
+            "avg_upload_seconds": self.upload_seconds / self.uploads if self.uploads else 0.0,
+        }
+
+
+avatar_pipeline = AvatarPipeline(make_storage())
@@ -0,0 +1,150 @@
+import logging
+import time
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from src.repositories.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    """Local token bucket of one client plus hits not yet reported to Redis."""
+
+    __slots__ = ('tokens', 'updated', 'pending', 'synced', 'window')
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.pending = 0
+        self.synced = now
+        self.window = None
+
+
+def default_identifier(request: Request) -> str:
+    """Client IP (first X-Forwarded-For entry if present) plus request path, same as fastapi_limiter."""
+    forwarded = request.headers.get('X-Forwarded-For')
+    ip = forwarded.split(',')[0] if forwarded else request.client.host
+    return ip + ':' + request.scope['path']
+
+
+class HybridRateLimiter:
+    """
+    Rate limiter dependency: in-process token bucket, hit counts are pushed to Redis in batches.
+
+    Each process admits requests from its local bucket and reports them to a shared Redis counter of the current
+    window every max_unsynced hits or sync_interval seconds, then trims local tokens to what is left globally.
+    max_unsynced is the strictness bound: with W workers a window can be exceeded by at most W * (max_unsynced - 1)
+    requests, max_unsynced=1 gives an exact limit with one Redis round trip per request.
+    Hits still unsynced when the window ends are pushed to that window's counter on the next request.
+    Without Redis the limit is enforced per process only.
+    """
+
+    redis = None
+    prefix = 'limiter'
+
+    @classmethod
+    def init(cls, redis, prefix: str = 'limiter') -> None:
+        """Attach redis.asyncio client, created on app startup."""
+        cls.redis = redis
+        cls.prefix = prefix
+
+    def __init__(self, times: int = 1, seconds: int = 1, max_unsynced: int = 1, sync_interval: float = 1.0,
+                 max_clients: int = 10000):
+        """
+        :param times: allowed requests per client in the window.
+        :type times: int
+        :param seconds: window length.
+        :type seconds: int
+        :param max_unsynced: max local hits before they are pushed to Redis.
+        :type max_unsynced: int
+        :param sync_interval: max seconds between pushes to Redis.
+        :type sync_interval: float
+        :param max_clients: max number of client buckets kept in memory.
+        :type max_clients: int
+        """
+        if times < 1 or seconds < 1 or max_unsynced < 1:
+            raise ValueError('times, seconds and max_unsynced must be positive')
+        if max_unsynced > times or sync_interval > seconds:
+            raise ValueError('max_unsynced must not exceed times and sync_interval must not exceed seconds')
+        self.times = times
+        self.seconds = seconds
+        self.rate = times / seconds
+        self.max_unsynced = max_unsynced
+        self.sync_interval = sync_interval
+        self._buckets = TTLCache(maxsize=max_clients, ttl=seconds * 2)
+        self.allowed = 0
+        self.rejected = 0
+        self.syncs = 0
+        self.errors = 0
+
+    async def __call__(self, request: Request):
+        key = f'{self.prefix}:{default_identifier(request)}:{self.times}:{self.seconds}'
+        now = time.monotonic()
+        bucket = self._buckets.get(key) or _Bucket(self.times, now)
+        self._buckets.set(key, bucket)
+        bucket.tokens = min(self.times, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        if bucket.tokens < 1:
+            self._reject()
+        bucket.tokens -= 1
+        window = int(time.time() // self.seconds)
+        if bucket.window != window:
+            # unsynced hits of a finished window go to its own counter, not to the current one
+            if self.redis is not None and bucket.pending:
+                await self._sync(key, bucket)
+            bucket.pending = 0
+            bucket.window = window
+        bucket.pending += 1
+        if self.redis is not None and (bucket.pending >= self.max_unsynced or now - bucket.synced >= self.sync_interval):
+            total = await self._sync(key, bucket)
+            if total is not None:
+                bucket.tokens = min(bucket.tokens, max(self.times - total, 0))
+                if total > self.times:
+                    self._reject()
+        self.allowed += 1
+
+    def _reject(self):
+        self.rejected += 1
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                            headers={"Retry-After": str(max(1, round(1 / self.rate)))})
+
+    async def _sync(self, key: str, bucket: _Bucket) -> int | None:
+        """
+        Push pending hits to the Redis counter of the bucket's window.
+
+        :return: global number of hits in the window, or None if Redis is not available.
+        """
+        pending, bucket.pending = bucket.pending, 0
+        bucket.synced = time.monotonic()
+        window_key = f'{key}:{bucket.window}'
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incrby(window_key, pending)
+                pipe.expire(window_key, self.seconds * 2)
+                total, _ = await pipe.execute()
+        except RedisError as err:
+            self.errors += 1
+            logger.warning('Rate limiter sync failed, limiting locally: %s', err)
+            return None
+        self.syncs += 1
+        return int(total)
+
+    def stats(self) -> dict:
+        """
+        Limiter metrics.
+
+        :return: allowed, rejected, Redis syncs and errors.
+        :rtype: dict
+        """
+        return {
+            "times": self.times,
+            "seconds": self.seconds,
+            "max_unsynced": self.max_unsynced,
+            "clients": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "syncs": self.syncs,
+            "errors": self.errors,
+        }
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import os
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+from dotenv import load_dotenv
+from fastapi_mail import ConnectionConfig
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAIL_CONNECTIONS = int(os.environ.get('MAIL_CONNECTIONS', 2))
+MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 20))
+MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE', 1000))
+MAIL_MAX_RETRIES = int(os.environ.get('MAIL_MAX_RETRIES', 3))
+MAIL_RETRY_BACKOFF = float(os.environ.get('MAIL_RETRY_BACKOFF', 0.5))
+
+
+def is_permanent(err: Exception) -> bool:
+    """5xx answers and refused recipients won't get better on retry."""
+    if isinstance(err, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(err, aiosmtplib.SMTPResponseException) and err.code >= 500
+
+
+class MailWorker:
+    """
+    Mail delivery queue with persistent SMTP connections.
+
+    Every worker task keeps one authenticated SMTP connection open and sends queued messages in batches over it,
+    so a signup spike costs one TLS handshake per worker instead of one per message.
+    Temporary failures are retried with exponential backoff on a fresh connection.
+    Until start() is called (e.g. in tests or scripts) messages are sent right away over a one-off connection.
+    """
+
+    def __init__(self, conf: ConnectionConfig, connections: int = MAIL_CONNECTIONS, batch_size: int = MAIL_BATCH_SIZE,
+                 queue_size: int = MAIL_QUEUE_SIZE, max_retries: int = MAIL_MAX_RETRIES,
+                 backoff: float = MAIL_RETRY_BACKOFF):
+        """
+        :param conf: fastapi_mail connection config.
+        :type conf: ConnectionConfig
+        :param connections: number of worker tasks, each one owns an SMTP connection.
+        :type connections: int
+        :param batch_size: max messages a worker takes from the queue at once.
+        :type batch_size: int
+        :param queue_size: max number of messages waiting for delivery.
+        :type queue_size: int
+        :param max_retries: retries of one message after a temporary failure.
+        :type max_retries: int
+        :param backoff: delay before the first retry, doubled on every next one.
+        :type backoff: float
+        """
+        self.conf = conf
+        self.connections = connections
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.batches = 0
+        self.connects = 0
+        self.latency_seconds = 0.0
+        self.max_latency_seconds = 0.0
+        self.send_seconds = 0.0
+
+    @property
+    def sender(self) -> str:
+        if self.conf.MAIL_FROM_NAME:
+            return f"{self.conf.MAIL_FROM_NAME} <{self.conf.MAIL_FROM}>"
+        return self.conf.MAIL_FROM
+
+    def start(self) -> None:
+        """Start worker tasks, call it on app startup."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.connections)]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """
+        Deliver what is queued, then stop workers and close their connections.
+
+        :param timeout: max seconds to wait for the queue to drain.
+        :type timeout: float
+        """
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error('Mail queue not drained on shutdown, %s messages lost', self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def send(self, message: EmailMessage) -> bool:
+        """
+        Queue message for delivery, or send it right away if the workers are not started.
+
+        :param message: message to send, From is filled in if missing.
+        :type message: EmailMessage
+        :return: False if the queue is full and the message was dropped, or if sending it right away failed.
+        :rtype: bool
+        """
+        if message['From'] is None:
+            message['From'] = self.sender
+        enqueued = time.perf_counter()
+        if not self._tasks:
+            smtp, delivered = await self._deliver(None, message, enqueued)
+            await self._close(smtp)
+            return delivered
+        try:
+            self._queue.put_nowait((enqueued, message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error('Mail queue is full, message to %s dropped', message['To'])
+            return False
+        return True
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(hostname=self.conf.MAIL_SERVER, port=self.conf.MAIL_PORT, timeout=self.conf.TIMEOUT,
+                               use_tls=self.conf.MAIL_SSL_TLS, start_tls=self.conf.MAIL_STARTTLS,
+                               validate_certs=self.conf.VALIDATE_CERTS)
+        await smtp.connect()
+        if self.conf.USE_CREDENTIALS:
+            await smtp.login(self.conf.MAIL_USERNAME, self.conf.MAIL_PASSWORD)
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: aiosmtplib.SMTP | None) -> None:
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _deliver(self, smtp: aiosmtplib.SMTP | None, message: EmailMessage,
+                       enqueued: float) -> tuple[aiosmtplib.SMTP | None, bool]:
+        """Send one message with retries, return the connection to reuse for the next one and whether it was sent."""
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+                await smtp.send_message(message)
+                break
+            except (aiosmtplib.SMTPException, OSError) as err:
+                if is_permanent(err) or attempt == self.max_retries:
+                    self.failed += 1
+                    logger.error('Mail to %s failed: %s', message['To'], err)
+                    return smtp, False
+                await self._close(smtp)
+                smtp = None
+                self.retries += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        now = time.perf_counter()
+        self.sent += 1
+        self.send_seconds += now - start
+        self.latency_seconds += now - enqueued
+        self.max_latency_seconds = max(self.max_latency_seconds, now - enqueued)
+        return smtp, True
+
+    async def _worker(self) -> None:
+        smtp = None
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                try:
+                    for enqueued, message in batch:
+                        smtp, _ = await self._deliver(smtp, message, enqueued)
+                    self.batches += 1
+                except Exception:
+                    logger.exception('Mail worker batch failed')
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            await self._close(smtp)
+
+    def stats(self) -> dict:
+        """
+        Delivery metrics.
+
+        :return: queue depth, delivered, failed and dropped messages, throughput and latency.
+        :rtype: dict
+        """
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "batches": self.batches,
+            "connects": self.connects,
+            "messages_per_second": self.sent / self.send_seconds if self.send_seconds else 0.0,
+            "avg_latency_seconds": self.latency_seconds / self.sent if self.sent else 0.0,
+            "max_latency_seconds": self.max_latency_seconds,
+        }
@@ -1,27 +1,165 @@
+import base64
+import json
+import os
+
 from fastapi import status, HTTPException
 from datetime import date, timedelta
-from sqlalchemy import or_
+from sqlalchemy import case, delete, func, or_, select, tuple_
+from sqlalchemy.orm import load_only, undefer
 from src.database.models import Contact, User
-from sqlalchemy.orm import Session
+from src.schemas import CONTACT_ROW_FIELDS, contact_row_type
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.repositories.auth import Hash, get_user_by_email, invalidate_user
+from src.repositories.cache import VersionedRedisCache
+
+SEARCH_LIMIT = 50
+CONTACTS_CACHE_TTL = int(os.environ.get('CONTACTS_CACHE_TTL', 300))
 
-from src.repositories.auth import Hash, get_user_by_email
+CONTACT_FIELDS = CONTACT_ROW_FIELDS
+KEY_FIELDS = ('id', 'name')
+LIST_FIELDS = tuple(field for field in CONTACT_FIELDS if field != 'data')
+
+# Read-through cache of contact reads, per user version is bumped by every contact write
+contacts_cache = VersionedRedisCache('contacts', ttl=CONTACTS_CACHE_TTL)
 
 hash_handler = Hash()
-async def get_all_contacts(user: User,db: Session):
+def parse_fields(fields: str | None) -> tuple:
+    """
+    Parse sparse fieldset, e.g. 'name,email'. Key fields id and name are always included.
+
+    :param fields: comma separated contact fields. Default is None (all fields except data).
+    :type fields: str
+    :return: field names in Contact order.
+    :rtype: tuple
+    """
+    if not fields:
+        return LIST_FIELDS
+    names = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = names - set(CONTACT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    names.update(KEY_FIELDS)
+    return tuple(field for field in CONTACT_FIELDS if field in names)
+
+def contacts_select(fast: bool = False, fields: tuple = LIST_FIELDS):
+    """
+    Select of Contact ORM objects with only the given columns loaded, or of plain columns for the fast path.
+
+    :param fast: select plain columns instead of ORM objects.
+    :type fast: bool
+    :param fields: columns to load.
+    :type fields: tuple
+    :return: select statement.
+    """
+    columns = [getattr(Contact, field) for field in fields]
+    if fast:
+        return select(*columns)
+    return select(Contact).options(load_only(*columns))
+
+def contacts_from(result, fast: bool = False, fields: tuple = LIST_FIELDS) -> list:
+    """
+    Map query result to Contact objects or ContactRow objects for the fast path.
+
+    :param result: result of contacts_select query.
+    :param fast: result rows are plain columns.
+    :type fast: bool
+    :param fields: selected columns.
+    :type fields: tuple
+    :return: contacts.
+    :rtype: List[Contact | ContactRow]
     """
-    Get a list of all contacts for current user.
+    if fast:
+        row_type = contact_row_type(fields)
+        return [row_type(*row) for row in result.all()]
+    return result.scalars().all()
+
+async def get_all_contacts(user: User,db: AsyncSession, limit: int = None, after: tuple = None, fast: bool = False,
+                           fields: tuple = LIST_FIELDS):
+    """
+    Get a list of all contacts for current user, ordered by (name, id).
 
     :param user: The user to retrieve contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param limit: max number of contacts. Default is None (all contacts).
+    :type limit: int
+    :param after: (name, id) key of the last contact from previous page.
+    :type after: tuple
+    :param fast: return ContactRow objects built from plain rows.
+    :type fast: bool
+    :param fields: columns to load, see parse_fields.
+    :type fields: tuple
     :return: A list of contacts.
     :rtype: List[Contact objects]
     """
-    result = db.query(Contact).filter_by(user = user.id).all()
-    return result
+    query = contacts_select(fast, fields).filter_by(user = user.id).order_by(Contact.name, Contact.id)
+    if after is not None:
+        query = query.filter(tuple_(Contact.name, Contact.id) > tuple_(*after))
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return contacts_from(result, fast, fields)
+
+def encode_cursor(contact: Contact) -> str:
+    """
+    Make opaque pagination cursor from contact key.
 
-async def create_contact(body, user: User, db: Session):
+    :param contact: last contact on the page.
+    :type contact: Contact
+    :return: cursor.
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(json.dumps([contact.name, contact.id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Get contact key from pagination cursor.
+
+    :param cursor: cursor from previous page.
+    :type cursor: str
+    :return: (name, id).
+    :rtype: tuple
+    """
+    try:
+        name, contact_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(name, str) or not isinstance(contact_id, int):
+            raise ValueError
+        return name, contact_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+async def get_contacts_page(user: User, db: AsyncSession, limit: int, cursor: str = None, fast: bool = False,
+                            fields: tuple = LIST_FIELDS) -> dict:
+    """
+    Get one page of contacts for current user with keyset pagination.
+
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param limit: page size.
+    :type limit: int
+    :param cursor: next_cursor from previous page. Default is None (first page).
+    :type cursor: str
+    :param fast: return ContactRow objects built from plain rows.
+    :type fast: bool
+    :param fields: columns to load, see parse_fields.
+    :type fields: tuple
+    :return: contacts, limit and cursor of the next page (None on the last page).
+    :rtype: dict
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    async def load():
+        contacts = await get_all_contacts(user, db, limit=limit + 1, after=after, fast=fast, fields=fields)
+        next_cursor = encode_cursor(contacts[limit - 1]) if len(contacts) > limit else None
+        return {"items": contacts[:limit], "limit": limit, "next_cursor": next_cursor}
+
+    return await contacts_cache.get_or_load(user.id, 'page', (limit, cursor, fast, fields), load)
+
+async def create_contact(body, user: User, db: AsyncSession):
     """
     Create a new contact for current user.
 
@@ -30,16 +168,17 @@ async def create_contact(body, user: User, db: Session):
     :param user: The user to retrieve contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: new contact.
     :rtype: Contact object
     """
     contact = Contact(name = body.name, surname = body.surname, email = body.email, birthday = body.birthday, data = body.data, user = user.id)
     db.add(contact)
-    db.commit()
+    await db.commit()
+    await contacts_cache.bump(user.id)
     return contact
 
-async def get_one_contact(name, user: User, db: Session):
+async def get_one_contact(name, user: User, db: AsyncSession):
     """
     Get a one contact for current user.
 
@@ -48,13 +187,17 @@ async def get_one_contact(name, user: User, db: Session):
     :param user: The user to retrieve Contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: contact.
     :rtype: Contact object
     """
-    return db.query(Contact).filter_by(name = name, user = user.id).first()
+    async def load():
+        result = await db.execute(select(Contact).options(undefer(Contact.data)).filter_by(name = name, user = user.id))
+        return result.scalars().first()
+
+    return await contacts_cache.get_or_load(user.id, 'one', (name,), load)
 
-async def update_contact(name, body, user: User, db: Session):
+async def update_contact(name, body, user: User, db: AsyncSession):
     """
     Update one contact for current user.
 
@@ -65,26 +208,28 @@ async def update_contact(name, body, user: User, db: Session):
     :param user: The user to retrieve Contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: contact or None if contact is not exist.
     :rtype: Contact object | None
     """
 
-    contact = db.query(Contact).filter_by(name = name, user = user.id).first()
+    result = await db.execute(select(Contact).options(undefer(Contact.data)).filter_by(name = name, user = user.id))
+    contact = result.scalars().first()
     if contact:
         contact.name = body.name
         contact.surname = body.surname
         contact.email = body.email
         contact.birthday = body.birthday
         contact.data = body.data
-        db.commit()
-        db.refresh(contact)
+        await db.commit()
+        await db.refresh(contact)
+        await contacts_cache.bump(user.id)
         return contact
     else:
         return None
 
 
-async def del_contact(name, user: User, db: Session):
+async def del_contact(name, user: User, db: AsyncSession):
     """
       Delite one contact for current user.
 
@@ -93,92 +238,235 @@ async def del_contact(name, user: User, db: Session):
       :param user: The user to retrieve Contacts for.
       :type user: User
       :param db: The database session.
-      :type db: Session
+      :type db: AsyncSession
       :return: None.
       """
 
-    contact = db.query(Contact).filter_by(name = name, user = user.id).first()
+    result = await db.execute(select(Contact).filter_by(name = name, user = user.id))
+    contact = result.scalars().first()
     if contact:
-        db.delete(contact)
-        db.commit()
+        await db.delete(contact)
+        await db.commit()
+        await contacts_cache.bump(user.id)
     else:
         return None
 
 
-async def upcoming_birthday(user: User,db: Session):
+async def resolve_contacts(keys: list, user: User, db: AsyncSession, *options) -> dict:
     """
-      Find all contacts for current user, wich have a birthday on this week.
+    Find contacts by ids and names with one IN query.
+
+    :param keys: contact ids (int) or names (str).
+    :type keys: list
+    :param user: The user to retrieve Contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param options: loader options, e.g. undefer(Contact.data).
+    :return: found contact for every key, a name resolves to its first contact in (name, id) order.
+    :rtype: dict
+    """
+    ids = {key for key in keys if isinstance(key, int)}
+    names = {key for key in keys if isinstance(key, str)}
+    conditions = []
+    if ids:
+        conditions.append(Contact.id.in_(ids))
+    if names:
+        conditions.append(Contact.name.in_(names))
+    query = select(Contact).options(*options).filter_by(user=user.id).filter(or_(*conditions))
+    result = await db.execute(query.order_by(Contact.name, Contact.id))
+    found = {}
+    for contact in result.scalars():
+        if contact.id in ids:
+            found[contact.id] = contact
+        if contact.name in names:
+            found.setdefault(contact.name, contact)
+    return found
+
+
+async def get_contacts_batch(keys: list, user: User, db: AsyncSession) -> list:
+    """
+    Get many contacts for current user.
+
+    :param keys: contact ids (int) or names (str).
+    :type keys: list
+    :param user: The user to retrieve Contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: (key, contact or None) pairs in keys order.
+    :rtype: list
+    """
+    found = await resolve_contacts(keys, user, db, undefer(Contact.data))
+    return [(key, found.get(key)) for key in keys]
+
+
+async def update_contacts_batch(items: list, user: User, db: AsyncSession) -> list:
+    """
+    Update many contacts for current user in one transaction.
+
+    :param items: (key, body) pairs, key is contact id (int) or name (str).
+    :type items: list
+    :param user: The user to retrieve Contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: (key, updated contact or None) pairs in items order.
+    :rtype: list
+    """
+    found = await resolve_contacts([key for key, _ in items], user, db, undefer(Contact.data))
+    results = []
+    for key, body in items:
+        contact = found.get(key)
+        if contact:
+            contact.name = body.name
+            contact.surname = body.surname
+            contact.email = body.email
+            contact.birthday = body.birthday
+            contact.data = body.data
+        results.append((key, contact))
+    if found:
+        await db.commit()
+        await contacts_cache.bump(user.id)
+    return results
+
+
+async def del_contacts_batch(keys: list, user: User, db: AsyncSession) -> list:
+    """
+    Delete many contacts for current user in one transaction.
+
+    :param keys: contact ids (int) or names (str).
+    :type keys: list
+    :param user: The user to retrieve Contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: (key, deleted) pairs in keys order.
+    :rtype: list
+    """
+    found = await resolve_contacts(keys, user, db, load_only(Contact.id, Contact.name))
+    if found:
+        ids = {contact.id for contact in found.values()}
+        await db.execute(delete(Contact).where(Contact.id.in_(ids)))
+        await db.commit()
+        await contacts_cache.bump(user.id)
+    return [(key, key in found) for key in keys]
+
+
+async def upcoming_birthday(user: User,db: AsyncSession, days: int = None, today: date = None, fields: tuple = LIST_FIELDS):
+    """
+      Find all contacts for current user, wich have a birthday in the next days (by default till the end of this week).
+      The window is compared on month/day only, so it works across year boundaries and uses the (user, month/day) index.
 
       :param user: The user to retrieve Contacts for.
       :type user: User
       :param db: The database session.
-      :type db: Session
-      :return: contacts.
+      :type db: AsyncSession
+      :param days: window size in days, today included. Default is None (till Sunday).
+      :type days: int
+      :param today: first day of the window. Default is None (current date).
+      :type today: date
+      :param fields: columns to load, see parse_fields.
+      :type fields: tuple
+      :return: contacts, nearest birthday first.
       :rtype: List[Contact objects]
       """
+    current_date = today or date.today()
+    if days is None:
+        days = 7 - current_date.weekday()
+    start_md = current_date.month * 100 + current_date.day
+    query = contacts_select(fields=fields).filter_by(user=user.id).filter(Contact.birthday.is_not(None))
+    end_date = current_date + timedelta(days=days - 1)
+    if days < 366 and end_date.year == current_date.year:
+        # one range of the (user, month/day) index, which also gives the order
+        end_md = end_date.month * 100 + end_date.day
+        query = query.filter(Contact.birthday_md.between(start_md, end_md))
+        query = query.order_by(Contact.birthday_md, Contact.id)
+    else:
+        if days < 366:
+            end_md = end_date.month * 100 + end_date.day
+            query = query.filter(or_(Contact.birthday_md >= start_md, Contact.birthday_md <= end_md))
+        next_year = case((Contact.birthday_md < start_md, 1), else_=0)
+        query = query.order_by(next_year, Contact.birthday_md, Contact.id)
 
-    result_list =[]
-    contacts = db.query(Contact).filter_by(user=user.id).order_by('birthday').all()
-    current_date = date.today()
-    end_of_week = current_date + timedelta(days=6 - current_date.weekday())
-    for contact in contacts:
-        if contact.birthday.month == current_date.month and contact.birthday.day >= current_date.day and contact.birthday <= end_of_week:
-            result_list.append(contact)
-    return result_list
+    async def load():
+        result = await db.execute(query)
+        return result.scalars().all()
 
+    return await contacts_cache.get_or_load(user.id, 'birthday', (current_date, days, fields), load)
 
-async def search(param, user: User, db: Session):
+
+async def search(param, user: User, db: AsyncSession, limit: int = SEARCH_LIMIT, fast: bool = False,
+                 fields: tuple = LIST_FIELDS):
     """
-      Find a contact for current user, with specify parameter(name, surname, email).
+      Find contacts for current user, with specify parameter(name, surname, email).
+      On PostgreSQL the ILIKE predicates are served by pg_trgm GIN indexes and results are ranked by similarity.
 
       :param param: parameter for search.
       :type param: string
       :param user: The user to retrieve Contacts for.
       :type user: User
       :param db: The database session.
-      :type db: Session
-      :return: contact.
-      :rtype: Contact object
+      :type db: AsyncSession
+      :param limit: max number of contacts.
+      :type limit: int
+      :param fast: return ContactRow objects built from plain rows.
+      :type fast: bool
+      :param fields: columns to load, see parse_fields.
+      :type fields: tuple
+      :return: contacts, best matches first.
+      :rtype: List[Contact objects]
       """
-    contacts = db.query(Contact).filter_by(user = user.id).filter(or_(Contact.name.ilike(f'%{param}%'),(Contact.surname.ilike(f'%{param}%')),
-                                            (Contact.email.ilike(f'%{param}%')))).all()
-    return contacts
+    pattern = '%' + param.replace('/', '//').replace('%', '/%').replace('_', '/_') + '%'
+    query = contacts_select(fast, fields).filter_by(user = user.id).filter(or_(Contact.name.ilike(pattern, escape='/'),
+                                                                 Contact.surname.ilike(pattern, escape='/'),
+                                                                 Contact.email.ilike(pattern, escape='/')))
+    if db.get_bind().dialect.name == 'postgresql':
+        rank = func.greatest(func.similarity(Contact.name, param), func.similarity(Contact.surname, param),
+                             func.similarity(Contact.email, param))
+        query = query.order_by(rank.desc(), Contact.id)
+    else:
+        query = query.order_by(Contact.name, Contact.id)
+    result = await db.execute(query.limit(limit))
+    return contacts_from(result, fast, fields)
 
-async def signup(body, db: Session):
+async def signup(body, db: AsyncSession):
     """Signup function
 
     :param body: json with email and password.
     :type body: JSON
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: new_user.
     :rtype: User
     """
-    is_exist = db.query(User).filter_by(email = body.email).first()
+    is_exist = await get_user_by_email(body.email, db)
     if is_exist:
         return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User is all ready exist")
-    new_user = User(email = body.email, password = hash_handler.get_password_hash(body.password))
+    new_user = User(email = body.email, password = await hash_handler.get_password_hash_async(body.password))
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    invalidate_user(new_user.email)
     return new_user
 
-async def confirmed_email( email, db: Session):
+async def confirmed_email( email, db: AsyncSession):
     """User confirmed his email
 
     :param email: user email.
     :type email: string
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None.
     """
 
-    user = db.query(User).filter_by(email=email).first()
+    user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    invalidate_user(user.email)
     return None
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """
     Change or update avatar for user.
 
@@ -187,11 +475,12 @@ async def update_avatar(email, url: str, db: Session) -> User:
     :param url: link to user new avatar.
     :type url: string
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: user.
     :rtype: User objact
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
+    await db.commit()
+    invalidate_user(user.email)
     return user
\ No newline at end of file
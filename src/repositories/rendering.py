@@ -0,0 +1,101 @@
+import os
+import time
+from pathlib import Path
+from typing import Iterable
+
+from dotenv import load_dotenv
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+load_dotenv()
+
+MAIL_TEMPLATE_CACHE = os.environ.get('MAIL_TEMPLATE_CACHE')
+
+
+class TemplateRegistry:
+    """
+    Email templates compiled once and kept in memory.
+
+    Compiled code is also stored in a Jinja bytecode cache on disk, so workers started later
+    skip the compilation too. Templates are not reloaded when their files change.
+    """
+
+    def __init__(self, folder: Path, cache_dir: str | None = MAIL_TEMPLATE_CACHE):
+        """
+        :param folder: templates folder.
+        :type folder: Path
+        :param cache_dir: bytecode cache folder. Default is Jinja's folder in the system temp dir.
+        :type cache_dir: str
+        """
+        self.folder = Path(folder)
+        self.env = Environment(loader=FileSystemLoader(self.folder), bytecode_cache=FileSystemBytecodeCache(cache_dir),
+                               auto_reload=False)
+        self._templates: dict[str, Template] = {}
+        self.compile_seconds = 0.0
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    def load(self) -> None:
+        """Compile every template in the folder, call it on app startup."""
+        for path in sorted(self.folder.glob('*.html')):
+            self.get(path.name)
+
+    def get(self, name: str) -> Template:
+        """
+        Compiled template, compiled on first use if load() did not get it.
+
+        :param name: template file name.
+        :type name: str
+        :return: compiled template.
+        :rtype: Template
+        """
+        template = self._templates.get(name)
+        if template is None:
+            start = time.perf_counter()
+            template = self._templates[name] = self.env.get_template(name)
+            self.compile_seconds += time.perf_counter() - start
+        return template
+
+    def render(self, name: str, **context) -> str:
+        """
+        Render one message body.
+
+        :param name: template file name.
+        :type name: str
+        :param context: template variables.
+        :return: rendered body.
+        :rtype: str
+        """
+        return self.render_many(name, [context])[0]
+
+    def render_many(self, name: str, contexts: Iterable[dict], **shared) -> list[str]:
+        """
+        Render bodies of a bulk send with one template lookup.
+
+        :param name: template file name.
+        :type name: str
+        :param contexts: per recipient template variables.
+        :type contexts: Iterable[dict]
+        :param shared: template variables common for all recipients, e.g. host.
+        :return: rendered bodies in contexts order.
+        :rtype: list[str]
+        """
+        template = self.get(name)
+        start = time.perf_counter()
+        bodies = [template.render({**shared, **context}) for context in contexts]
+        self.render_seconds += time.perf_counter() - start
+        self.renders += len(bodies)
+        return bodies
+
+    def stats(self) -> dict:
+        """
+        Rendering metrics.
+
+        :return: compiled templates, compile time, rendered bodies and average render time.
+        :rtype: dict
+        """
+        return {
+            "templates": len(self._templates),
+            "compile_seconds": self.compile_seconds,
+            "renders": self.renders,
+            "avg_render_seconds": self.render_seconds / self.renders if self.renders else 0.0,
+        }
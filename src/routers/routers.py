@@ -1,9 +1,16 @@
-import cloudinary
-import cloudinary.uploader
-from fastapi import APIRouter, Depends,  HTTPException, status, BackgroundTasks, Request, UploadFile, File
-from fastapi.security import HTTPBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from fastapi_limiter.depends import RateLimiter
+import hashlib
+import re
+from datetime import date
+
+from fastapi import APIRouter, Depends,  HTTPException, status, BackgroundTasks, Request, UploadFile, File, Query, Security
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 from src.database.db import get_db
@@ -11,9 +18,12 @@ from src.database.models import User
 from src.repositories import auth as auth
 from src.repositories.auth import get_user_by_email
 from src.repositories.email import send_email
+from src.repositories.images import LocalStorage, avatar_pipeline
 from src.repositories.operations import get_one_contact, del_contact, confirmed_email
 import src.repositories.operations as src
-from src.schemas import ContactResponse, UserModel, TokenModel, RequestEmail, UserDb
+from src.repositories import bulk
+from src.repositories.limiter import HybridRateLimiter
+from src.schemas import ContactResponse, UserModel, TokenModel, RequestEmail, UserDb, BatchKeys, BatchUpdate, BatchResult
 
 
 router = APIRouter(prefix='/contacts', tags=['contacts'])
@@ -21,9 +31,71 @@ utils = APIRouter(prefix='/utils', tags=['utils'])
 users = APIRouter(prefix='/users', tags=['users'])
 security = HTTPBearer()
 
+CACHE_HEADERS = {'Cache-Control': 'private, no-cache'}
+AVATAR_HEADERS = {'Cache-Control': 'public, max-age=31536000, immutable'}
+AVATAR_NAME = re.compile(r'[0-9a-f]{64}\.jpg')
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match header of the request against ETag (weak comparison)."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag, **CACHE_HEADERS})
+
+
+def json_response(result, fast: bool = False, headers: dict | None = None) -> JSONResponse:
+    """
+    Render JSON response. Fast path hands ContactRow objects straight to orjson, skipping jsonable_encoder.
+
+    :param result: response content.
+    :param fast: use orjson (falls back to the default encoder if orjson is not installed).
+    :type fast: bool
+    :param headers: response headers.
+    :type headers: dict
+    :return: JSONResponse or ORJSONResponse.
+    """
+    if fast and orjson is not None:
+        return ORJSONResponse(content=result, headers=headers)
+    return JSONResponse(content=jsonable_encoder(result), headers=headers)
+
+
+def conditional_response(request: Request, result, etag: str | None = None, fast: bool = False) -> Response:
+    """
+    JSON response with ETag, or 304 if client already has it.
+
+    :param request: fastapi Request.
+    :type request: Request object
+    :param result: response content.
+    :param etag: ETag from contacts version. Default is None (hash of the body).
+    :type etag: str
+    :param fast: render with orjson.
+    :type fast: bool
+    :return: JSONResponse or 304 Response.
+    """
+    response = json_response(result, fast, CACHE_HEADERS)
+    etag = etag or f'W/"{hashlib.sha1(response.body).hexdigest()}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers['ETag'] = etag
+    return response
+
+
+def batch_result(key, contact) -> dict:
+    """Per item result of a batch request."""
+    if contact is None:
+        return {"key": key, "status": status.HTTP_404_NOT_FOUND}
+    return {"key": key, "status": status.HTTP_200_OK, "contact": contact}
+
 
 @router.get('/get_contatact', response_model=ContactResponse)
-async def get_contact(name, current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def get_contact(name, current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
     """Find one contact for current user with parameter NAME.
 
     :param name: contact name.
@@ -31,7 +103,7 @@ async def get_contact(name, current_user: User = Depends(auth.get_current_user),
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact with new data.
     :rtype: Contact object
     """
@@ -41,22 +113,41 @@ async def get_contact(name, current_user: User = Depends(auth.get_current_user),
     return result
 
 
-@router.get('/get_all_contatact', dependencies=[Depends(RateLimiter(times=1, seconds=5))])
-async def get_all_contact(current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    """Get all contacts for current user from db
+# Read hot path: 1 request per 5 seconds on average as 12 per minute, so hits can be pushed to Redis
+# every 3 admitted requests (or 20 seconds) instead of on every request.
+# With W workers a client gets at most W * 2 extra requests per minute.
+@router.get('/get_all_contatact', dependencies=[Depends(HybridRateLimiter(times=12, seconds=60, max_unsynced=3,
+                                                                          sync_interval=20))])
+async def get_all_contact(request: Request, limit: int = Query(default=50, ge=1, le=500), cursor: str | None = None,
+                          fast: bool = False, fields: str | None = None, current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    """Get contacts for current user from db, page by page. Supports ETag / If-None-Match.
 
+    :param request: fastapi Request.
+    :type request: Request object
+    :param limit: page size.
+    :type limit: int
+    :param cursor: next_cursor from previous page.
+    :type cursor: str
+    :param fast: opt-in fast path, plain rows serialized with orjson.
+    :type fast: bool
+    :param fields: comma separated contact fields (id, name, surname, email, birthday, data). Default is all but data.
+    :type fields: str
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
-    :return: List[Contacts objects]
+    :type db: AsyncSession
+    :return: dict with items (List[Contacts objects]), limit and next_cursor, or 304.
     """
-    result = await src.get_all_contacts(current_user,db)
-    return result
+    fields = src.parse_fields(fields)
+    etag = await src.contacts_cache.etag(current_user.id, 'page', (limit, cursor, fast, fields))
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    result = await src.get_contacts_page(current_user, db, limit, cursor, fast, fields)
+    return conditional_response(request, result, etag, fast)
 
 
-@router.put('/update_contatact', status_code=status.HTTP_201_CREATED,  dependencies=[Depends(RateLimiter(times=1, seconds=5))])
-async def update_contact(name, body : ContactResponse, current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+@router.put('/update_contatact', status_code=status.HTTP_201_CREATED,  dependencies=[Depends(HybridRateLimiter(times=1, seconds=5))])
+async def update_contact(name, body : ContactResponse, current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
     """Update existing contact with new information.
 
     :param name: contact name.
@@ -66,7 +157,7 @@ async def update_contact(name, body : ContactResponse, current_user: User = Depe
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact with new data.
     :rtype: Contact object
     """
@@ -76,7 +167,7 @@ async def update_contact(name, body : ContactResponse, current_user: User = Depe
     return result
 
 @router.delete('/delete_contact')
-async def delete_contact(name,current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def delete_contact(name,current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
     """Create a new contact.
 
     :param name: contact name.
@@ -84,7 +175,7 @@ async def delete_contact(name,current_user: User = Depends(auth.get_current_user
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: (str) message 'Delited'.
     """
     result = await del_contact(name, current_user, db)
@@ -92,8 +183,8 @@ async def delete_contact(name,current_user: User = Depends(auth.get_current_user
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
     return 'Delited'
 
-@router.post('/new_contatact', response_model=ContactResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(RateLimiter(times=2, seconds=60))])
-async def create_contact(body: ContactResponse, current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+@router.post('/new_contatact', response_model=ContactResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(HybridRateLimiter(times=2, seconds=60))])
+async def create_contact(body: ContactResponse, current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
     """Create a new contact.
 
     :param body: contact name, surname, birthday, data.
@@ -101,42 +192,159 @@ async def create_contact(body: ContactResponse, current_user: User = Depends(aut
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: new contact.
     """
     result = await src.create_contact(body,current_user, db)
     return result
 
 
-@utils.get('/upcoming_birthday')
-async def upcoming_birthday(current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    """Find contacts, who have a birthday on this week.
+@router.post('/batch_get', response_model=list[BatchResult])
+async def get_contacts_batch(body: BatchKeys, current_user: User = Depends(auth.get_current_user),
+                             db: AsyncSession = Depends(get_db)):
+    """Find many contacts of current user with one query.
+
+    :param body: contact ids or names.
+    :type body: JSON
+    :param current_user: user object.
+    :type current_user:  class User object
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: per key result, status 200 with contact or 404.
+    """
+    result = await src.get_contacts_batch(body.keys, current_user, db)
+    return [batch_result(key, contact) for key, contact in result]
+
+
+@router.put('/batch_update', response_model=list[BatchResult],
+            dependencies=[Depends(HybridRateLimiter(times=1, seconds=5))])
+async def update_contacts_batch(body: BatchUpdate, current_user: User = Depends(auth.get_current_user),
+                                db: AsyncSession = Depends(get_db)):
+    """Update many contacts of current user in one transaction.
+    Limited like update_contatact, one request per 5 seconds, so a client updates at most BATCH_MAX_ITEMS per window.
+
+    :param body: items of contact id or name and its new data.
+    :type body: JSON
+    :param current_user: user object.
+    :type current_user:  class User object
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: per key result, status 200 with updated contact or 404.
+    """
+    result = await src.update_contacts_batch([(item.key, item.contact) for item in body.items], current_user, db)
+    return [batch_result(key, contact) for key, contact in result]
 
+
+@router.post('/batch_delete', response_model=list[BatchResult])
+async def delete_contacts_batch(body: BatchKeys, current_user: User = Depends(auth.get_current_user),
+                                db: AsyncSession = Depends(get_db)):
+    """Delete many contacts of current user in one transaction.
+
+    :param body: contact ids or names.
+    :type body: JSON
+    :param current_user: user object.
+    :type current_user:  class User object
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: per key result, status 200 or 404.
+    """
+    result = await src.del_contacts_batch(body.keys, current_user, db)
+    return [{"key": key, "status": status.HTTP_200_OK if deleted else status.HTTP_404_NOT_FOUND}
+            for key, deleted in result]
+
+
+@router.get('/export')
+async def export_contacts(fmt: str = Query(default='ndjson', alias='format', pattern='^(ndjson|csv)$'),
+                          current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    """Stream all contacts of current user as NDJSON or CSV.
+
+    :param fmt: 'ndjson' or 'csv'.
+    :type fmt: str
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
-    :return: List[Contacts objects]
+    :type db: AsyncSession
+    :return: StreamingResponse
     """
-    result = await src.upcoming_birthday(current_user, db)
+    batches = bulk.stream_contacts(current_user, db)
+    if fmt == 'csv':
+        return StreamingResponse(bulk.to_csv(batches), media_type='text/csv',
+                                 headers={'Content-Disposition': 'attachment; filename="contacts.csv"'})
+    return StreamingResponse(bulk.to_ndjson(batches), media_type='application/x-ndjson',
+                             headers={'Content-Disposition': 'attachment; filename="contacts.ndjson"'})
+
+
+@router.post('/import', status_code=status.HTTP_201_CREATED)
+async def import_contacts(file: UploadFile = File(),
+                          fmt: str = Query(default='ndjson', alias='format', pattern='^(ndjson|csv)$'),
+                          current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    """Import contacts for current user from NDJSON or CSV file.
+    Files bigger than IMPORT_MAX_BYTES are rejected with 413 before they are read, see UploadLimitMiddleware.
+
+    :param file: file with one contact per line (name, surname, email, birthday, data).
+    :type file: UploadFile
+    :param fmt: 'ndjson' or 'csv'.
+    :type fmt: str
+    :param current_user: user object.
+    :type current_user:  class User object
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: dict with imported and failed counts, per-row errors and rows per second.
+    """
+    result = await bulk.import_contacts(bulk.read_rows(file.file, fmt), current_user, db)
     return result
+
+
+@utils.get('/upcoming_birthday')
+async def upcoming_birthday(request: Request, days: int | None = Query(default=None, ge=1, le=366),
+                            fields: str | None = None, current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    """Find contacts, who have a birthday on this week or in the next days. Supports ETag / If-None-Match.
+
+    :param request: fastapi Request.
+    :type request: Request object
+    :param days: window size in days, today included. Default is till the end of this week.
+    :type days: int
+    :param fields: comma separated contact fields (id, name, surname, email, birthday, data). Default is all but data.
+    :type fields: str
+    :param current_user: user object.
+    :type current_user:  class User object
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: List[Contacts objects] or 304.
+    """
+    today = date.today()
+    fields = src.parse_fields(fields)
+    etag = await src.contacts_cache.etag(current_user.id, 'birthday', (today, days, fields))
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    result = await src.upcoming_birthday(current_user, db, days, today, fields)
+    return conditional_response(request, result, etag)
 @utils.get('/search')
-async def search(param, current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def search(param, limit: int = Query(default=src.SEARCH_LIMIT, ge=1, le=200), fast: bool = False,
+                 fields: str | None = None, current_user: User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
     """
-    Find any contact with specific parameter.
+    Find any contact with specific parameter, best matches first.
 
     :param param: str. Word for find info.
+    :param limit: max number of contacts.
+    :type limit: int
+    :param fast: opt-in fast path, plain rows serialized with orjson.
+    :type fast: bool
+    :param fields: comma separated contact fields (id, name, surname, email, birthday, data). Default is all but data.
+    :type fields: str
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: List[User objects]
     """
-    result = await src.search(param, current_user, db)
+    result = await src.search(param, current_user, db, limit, fast, src.parse_fields(fields))
+    if fast:
+        return json_response(result, fast)
     return result
 
 @utils.post('/signup', status_code=status.HTTP_201_CREATED)
-async def signup(body : UserModel ,background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body : UserModel ,background_tasks: BackgroundTasks, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Sign up.
 
@@ -147,44 +355,58 @@ async def signup(body : UserModel ,background_tasks: BackgroundTasks, request: R
     :param request: fastapi Request.
     :type request: Request object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: str
     """
     await src.signup(body, db)
     background_tasks.add_task(send_email, body.email, request.base_url)
     return 'Check your email'
 @utils.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """User login function.
     :param body: user data depends on fastapi security OAuth2PasswordRequestForm.
     :type body:OAuth2PasswordRequestForm object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: access token, refresh token.
     """
     user = await get_user_by_email(body.username, db)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
-    if not src.hash_handler.verify_password(body.password, user.password):
+    if not await src.hash_handler.verify_password_async(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
     access_token = await auth.create_access_token(data={"sub": user.email})
-    refresh_token = await auth.create_refresh_token(data={"sub": user.email})
-    user.access_token = access_token
-    db.commit()
-    await auth.update_token(user, refresh_token, db)
+    refresh_token = await auth.issue_refresh_token(user.id, user.email, db)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
+
+@utils.get('/refresh_token', response_model=TokenModel)
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security),
+                        db: AsyncSession = Depends(get_db)):
+    """
+    Exchange refresh token for new access and refresh tokens, the old refresh token stops working.
+
+    :param credentials: refresh token from Authorization header.
+    :type credentials: HTTPAuthorizationCredentials
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: access token, refresh token.
+    """
+    email, new_refresh_token = await auth.rotate_refresh_token(credentials.credentials, db)
+    access_token = await auth.create_access_token(data={"sub": email})
+    return {"access_token": access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
+
 @utils.get('/confirmed_email/{token}')
-async def _confirmed_email(token: str, db: Session = Depends(get_db)):
+async def _confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     Confirm email for current user.
 
     :param token: user token.
     :type token: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: str
     """
     email = await auth.get_email_from_token(token)
@@ -198,7 +420,7 @@ async def _confirmed_email(token: str, db: Session = Depends(get_db)):
 
 @utils.post('/request_email')
 async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_db)):
     """
     Send email to user, to confirmed his registration.
 
@@ -209,7 +431,7 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     :param request: fastapi Request.
     :type request: Request object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: str
     """
     user = await auth.get_user_by_email(body.email, db)
@@ -222,31 +444,45 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
 
 @users.patch('/avatar', response_model=UserDb)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db)):
     """
-    Update user avatar.
+    Update user avatar, resized to 250x250 before upload.
 
     :param file: new avatar file. Depends on fastapi UploadFile.
     :type file: file path
     :param current_user: user object.
     :type current_user:  class User object
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: User object
     """
-    cloudinary.config(
-        cloud_name="dsjusqa4p",
-        api_key="599877185773136",
-        api_secret="VFeBRMltUi1d8Jz_aCwOGLF4b8k",
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'ContactApp/{current_user.email}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'ContactApp/{current_user.email}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
+    src_url = await avatar_pipeline.process(file, f'ContactApp/{current_user.email}')
     user = await src.update_avatar(current_user.email, src_url, db)
     return user
 
+
+@users.get('/avatars/{name}', response_class=FileResponse)
+async def get_avatar(name: str, request: Request):
+    """
+    Avatar from local storage. File names are content hashes, so the file is cached by clients forever.
+
+    :param name: '<sha256>.jpg' file name.
+    :type name: str
+    :param request: request with optional If-None-Match header.
+    :type request: Request
+    :return: JPEG image or 304 if the client has it.
+    """
+    storage = avatar_pipeline.storage
+    if not isinstance(storage, LocalStorage) or not AVATAR_NAME.fullmatch(name):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    etag = f'"{name[:-4]}"'
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag, **AVATAR_HEADERS})
+    path = storage.path(name)
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    return FileResponse(path, media_type='image/jpeg', headers={'ETag': etag, **AVATAR_HEADERS})
+
 @users.get("/me/", response_model=UserDb)
 async def read_users_me(current_user: User = Depends(auth.get_current_user)):
     ''' User profile.
@@ -1,4 +1,6 @@
+from dataclasses import dataclass, fields, make_dataclass
 from datetime import date
+from functools import lru_cache
 from pydantic import BaseModel, Field, EmailStr
 
 
@@ -19,6 +21,25 @@ class ContactResponse(ContactModel):
     class Config:
         from_attributes = True
 
+@dataclass(slots=True)
+class ContactRow:
+    """Lightweight read-only contact for list responses, built from plain rows and serialized by orjson natively."""
+    id: int
+    name: str
+    surname: str | None
+    email: str | None
+    birthday: date | None
+    data: str | None
+
+CONTACT_ROW_FIELDS = tuple(field.name for field in fields(ContactRow))
+
+@lru_cache(maxsize=None)
+def contact_row_type(field_names: tuple) -> type:
+    """ContactRow variant with only the given fields (sparse fieldsets), one slotted class per field set."""
+    if field_names == CONTACT_ROW_FIELDS:
+        return ContactRow
+    return make_dataclass('ContactRow', [(name, ContactRow.__annotations__[name]) for name in field_names], slots=True)
+
 class UserModel(BaseModel):
     email: str
     password: str
@@ -37,4 +58,33 @@ class UserDb(BaseModel):
     avatar: str
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+BATCH_MAX_ITEMS = 500
+
+class ContactDb(BaseModel):
+    id: int
+    name: str
+    surname: str | None
+    email: str | None
+    birthday: date | None
+    data: str | None
+
+    class Config:
+        from_attributes = True
+
+class BatchKeys(BaseModel):
+    """Contact ids (int) or names (str)."""
+    keys: list[int | str] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchUpdateItem(BaseModel):
+    key: int | str
+    contact: ContactResponse
+
+class BatchUpdate(BaseModel):
+    items: list[BatchUpdateItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchResult(BaseModel):
+    key: int | str
+    status: int
+    contact: ContactDb | None = None
@@ -0,0 +1,154 @@
+import time
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+import fakeredis.aioredis
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import User
+from src.repositories import auth
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.repositories.cache import TTLCache, VersionedRedisCache
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_expired(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        with patch('src.repositories.cache.time.monotonic', return_value=100):
+            cache.set('a', 1, ttl=5)
+        with patch('src.repositories.cache.time.monotonic', return_value=106):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+
+
+class TestCurrentUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        auth.user_cache.clear()
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
+        self.result.scalars().first.return_value = User(id=7, email='test@gmail.com', avatar='url', confirmed=True)
+
+    async def test_get_current_user_is_cached(self):
+        token = await auth.create_access_token({"sub": 'test@gmail.com'})
+        first = await auth.get_current_user(token, self.session)
+        second = await auth.get_current_user(token, self.session)
+        self.assertEqual(first, second)
+        self.assertEqual(second.id, 7)
+        self.assertEqual(self.session.execute.await_count, 1)
+
+    async def test_invalidate_user(self):
+        token = await auth.create_access_token({"sub": 'test@gmail.com'})
+        await auth.get_current_user(token, self.session)
+        auth.invalidate_user('test@gmail.com')
+        await auth.get_current_user(token, self.session)
+        self.assertEqual(self.session.execute.await_count, 2)
+
+
+class TestTokenCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        auth.token_cache.clear()
+
+    async def test_decode_token_is_cached(self):
+        token = await auth.create_access_token({"sub": 'test@gmail.com'})
+        with patch('src.repositories.auth.jwt.decode', wraps=jwt.decode) as decode:
+            first = auth.decode_token(token)
+            second = auth.decode_token(token)
+        self.assertEqual(first, second)
+        self.assertEqual(decode.call_count, 1)
+
+    async def test_scope_checked_on_cache_hit(self):
+        token = await auth.create_refresh_token({"sub": 'test@gmail.com'})
+        self.assertEqual(await auth.get_email_form_refresh_token(token), 'test@gmail.com')
+        hits = auth.token_cache.hits
+        with self.assertRaises(HTTPException) as error:
+            await auth.get_current_user(token, AsyncMock(spec=AsyncSession))
+        self.assertEqual(error.exception.status_code, 401)
+        self.assertEqual(auth.token_cache.hits, hits + 1)
+
+    async def test_entry_expires_with_token(self):
+        token = await auth.create_access_token({"sub": 'test@gmail.com'}, expires_delta=2)
+        exp = jwt.get_unverified_claims(token)['exp']
+        auth.decode_token(token)
+        with patch('src.repositories.cache.time.monotonic', return_value=time.monotonic() + exp - time.time() + 1), \
+                patch('src.repositories.auth.jwt.decode', wraps=jwt.decode) as decode:
+            auth.decode_token(token)
+        self.assertEqual(decode.call_count, 1)
+
+
+
+class TestVersionedRedisCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = VersionedRedisCache('test', ttl=60)
+        self.cache.init(fakeredis.aioredis.FakeRedis(decode_responses=True))
+        self.loader = AsyncMock(return_value=[{"name": "John"}])
+
+    async def test_read_through(self):
+        first = await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        second = await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        self.assertEqual(first, second)
+        self.assertEqual(self.loader.await_count, 1)
+        self.assertEqual(self.cache.stats()['hit_ratio'], 0.5)
+
+    async def test_params_and_owner_are_separate(self):
+        await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        await self.cache.get_or_load(1, 'all', (20,), self.loader)
+        await self.cache.get_or_load(2, 'all', (10,), self.loader)
+        self.assertEqual(self.loader.await_count, 3)
+
+    async def test_bump_invalidates_owner(self):
+        await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        await self.cache.get_or_load(2, 'all', (10,), self.loader)
+        await self.cache.bump(1)
+        await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        await self.cache.get_or_load(2, 'all', (10,), self.loader)
+        self.assertEqual(self.loader.await_count, 3)
+
+    async def test_lost_version_does_not_revive_entries(self):
+        await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        await self.cache.redis.delete('test:version:1')
+        await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        self.assertEqual(self.loader.await_count, 2)
+
+    async def test_etag_follows_version(self):
+        etag = await self.cache.etag(1, 'all', (10,))
+        self.assertEqual(etag, await self.cache.etag(1, 'all', (10,)))
+        self.assertNotEqual(etag, await self.cache.etag(1, 'all', (20,)))
+        await self.cache.bump(1)
+        self.assertNotEqual(etag, await self.cache.etag(1, 'all', (10,)))
+
+    async def test_redis_down_reads_database(self):
+        self.cache.redis = AsyncMock()
+        self.cache.redis.get.side_effect = RedisConnectionError()
+        result = await self.cache.get_or_load(1, 'all', (10,), self.loader)
+        self.assertEqual(result, [{"name": "John"}])
+        self.assertEqual(self.cache.stats()['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,23 @@
 import unittest
 from datetime import date
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Contact, User
-from src.repositories.operations import get_all_contacts, create_contact, get_one_contact, del_contact, update_contact
+from fastapi import HTTPException
+
+from src.repositories.operations import get_all_contacts, create_contact, get_one_contact, del_contact, update_contact, \
+    get_contacts_page, decode_cursor
 from src.schemas import ContactModel
 
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=30)
         self.contact = Contact(name = 'John', surname = "Doe",
                                email = "example@gmail.com",
@@ -21,10 +26,29 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_all_contacts(self):
         result = [Contact(), Contact(), Contact()]
-        self.session.query().filter_by().all.return_value = result
+        self.result.scalars().all.return_value = result
         func_res = await get_all_contacts(self.user, self.session)
         self.assertEqual(func_res, result)
 
+    async def test_get_contacts_page(self):
+        result = [Contact(id=1, name='Anna'), Contact(id=2, name='Bob'), Contact(id=3, name='Bob')]
+        self.result.scalars().all.return_value = result
+        page = await get_contacts_page(self.user, self.session, limit=2)
+        self.assertEqual(page['items'], result[:2])
+        self.assertEqual(page['limit'], 2)
+        self.assertEqual(decode_cursor(page['next_cursor']), ('Bob', 2))
+
+    async def test_get_contacts_last_page(self):
+        result = [Contact(id=1, name='Anna')]
+        self.result.scalars().all.return_value = result
+        page = await get_contacts_page(self.user, self.session, limit=2)
+        self.assertEqual(page['items'], result)
+        self.assertIsNone(page['next_cursor'])
+
+    def test_decode_invalid_cursor(self):
+        with self.assertRaises(HTTPException):
+            decode_cursor('not a cursor')
+
     async def test_create_contact(self):
         body = ContactModel(name = self.contact.name,
                             surname = self.contact.surname,
@@ -41,27 +65,27 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_one_contact(self):
         contact = Contact()
-        self.session.query().filter_by().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await get_one_contact(self.contact.name, self.user, self.session)
         self.assertEqual(result, contact)
 
     async def test_get_one_contact_is_none(self):
         contact = None
-        self.session.query().filter_by().first.return_value = None
+        self.result.scalars().first.return_value = None
         result = await get_one_contact(self.contact.name, self.user, self.session)
         self.assertEqual(result, contact)
         self.assertIsNone(result)
 
     async def test_del_contact(self):
         contact = Contact()
-        self.session.query().filter_by.first.return_value = contact
+        self.result.scalars.first.return_value = contact
         result = await del_contact(self.contact.name, self.user, self.session)
         self.assertIsNone(result)
         self.assertIsNot(result, contact)
 
     async def test_update_contact(self):
         contact = Contact()
-        self.session.query().filter_by.first.return_value = contact
+        self.result.scalars.first.return_value = contact
         new_body = self.contact
         self.contact.name = "Viktor"
         result = await update_contact(self.contact.name, new_body, self.user, self.session)
@@ -0,0 +1,296 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from src.database.models import Contact, User
+from src.repositories import bulk
+from src.repositories.auth import Hash
+from src.repositories.operations import upcoming_birthday
+from tests.conftest import AsyncTestingSessionLocal, async_engine
+
+
+@pytest.fixture(scope="module")
+def token(client, session, user):
+    current_user = User(email=user.get('email'), password=Hash().get_password_hash(user.get('password')), confirmed=True)
+    session.add(current_user)
+    session.commit()
+    for number in range(7):
+        session.add(Contact(name=f'Name{number}', surname='Doe', email=f'doe{number}@example.com',
+                            birthday=date(1990, 1, number + 1), data='notes, "quoted"', user=current_user.id))
+    session.commit()
+    response = client.post(
+        "/utils/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["access_token"]
+
+
+def test_export_ndjson(client, token):
+    response = client.get("/contacts/export", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 7
+    assert rows[0]["name"] == "Name0"
+    assert rows[0]["birthday"] == "1990-01-01"
+
+
+def test_export_csv(client, token):
+    response = client.get("/contacts/export", params={"format": "csv"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 7
+    assert rows[6]["data"] == 'notes, "quoted"'
+
+
+def test_export_wrong_format(client, token):
+    response = client.get("/contacts/export", params={"format": "xml"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 422, response.text
+
+
+def test_import_ndjson(client, token):
+    lines = [
+        json.dumps({"name": "Imported", "surname": "One", "email": "one@example.com", "birthday": "1991-02-03"}),
+        "not json",
+        json.dumps({"name": "Imported", "surname": "Two", "email": "two@example.com", "birthday": "no date"}),
+        "",
+        json.dumps({"name": "Imported", "surname": "Three", "email": "three@example.com", "birthday": "1992-03-04",
+                    "data": "notes"}),
+    ]
+    response = client.post("/contacts/import", files={"file": ("contacts.ndjson", "\n".join(lines))},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["failed"] == 2
+    assert [error["row"] for error in data["errors"]] == [2, 3]
+    assert "birthday" in data["errors"][1]["error"]
+    assert data["rows_per_second"] > 0
+
+
+def test_import_csv(client, token):
+    content = "name,surname,email,birthday,data\nCsv,One,csv1@example.com,1993-04-05,\nCsv,Two,csv2@example.com,1994-05-06,x\n"
+    response = client.post("/contacts/import", params={"format": "csv"}, files={"file": ("contacts.csv", content)},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["failed"] == 0
+
+
+def test_import_not_utf8(client, session, token):
+    lines = [b'\xff\xfe{"name": "Bad"}',
+             json.dumps({"name": "Utf", "surname": "One", "email": "utf@example.com", "birthday": "1991-02-03"}).encode()]
+    response = client.post("/contacts/import", files={"file": ("contacts.ndjson", b"\n".join(lines))},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert (data["imported"], data["failed"]) == (1, 1)
+    assert data["errors"][0]["row"] == 1
+    assert "utf-8" in data["errors"][0]["error"]
+    content = b"name,surname,email,birthday,data\nCsv,\xe9,bad@example.com,1993-04-05,\nCsv,Three,csv3@example.com,1993-04-05,\n"
+    response = client.post("/contacts/import", params={"format": "csv"}, files={"file": ("contacts.csv", content)},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert (data["imported"], data["failed"]) == (1, 1)
+    assert data["errors"][0]["row"] == 2
+    session.query(Contact).filter(Contact.email.in_(["utf@example.com", "csv3@example.com"])).delete()
+    session.commit()
+
+
+def test_import_too_big(client, token):
+    content = b"x" * (bulk.IMPORT_MAX_BYTES + 100 * 1024)
+    response = client.post("/contacts/import", files={"file": ("contacts.ndjson", content)},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 413, response.text
+
+
+def test_import_yields_to_event_loop(session):
+    rows = ((number, ValueError('bad row')) for number in range(1, 11))
+
+    async def run():
+        turns = 0
+
+        async def other_request():
+            nonlocal turns
+            while True:
+                turns += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(other_request())
+        await asyncio.sleep(0)
+        async with AsyncTestingSessionLocal() as db:
+            report = await bulk.import_contacts(rows, User(id=0), db, chunk_size=2)
+        task.cancel()
+        return report, turns
+
+    report, turns = asyncio.run(run())
+    assert report["failed"] == 10
+    assert turns > 5
+
+
+def test_import_chunk_reports_only_rejected_rows(session):
+    rows = [(number, {"name": f"Chunk{number}", "surname": "Row", "email": "chunk@example.com",
+                      "birthday": date(1990, 1, 1), "user": None}) for number in range(1, 4)]
+    rows[1][1]["name"] = None
+
+    async def run():
+        report = bulk.ImportReport()
+        async with AsyncTestingSessionLocal() as db:
+            await bulk._insert_chunk(rows, db, report)
+        return report
+
+    report = asyncio.run(run())
+    assert report.imported == 2
+    assert [error["row"] for error in report.errors] == [2]
+    assert "NOT NULL" in report.errors[0]["error"]
+
+
+def test_search(client, token):
+    response = client.get("/utils/search", params={"param": "name1"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert [contact["name"] for contact in response.json()] == ["Name1"]
+
+
+def test_search_limit_and_wildcards(client, token):
+    response = client.get("/utils/search", params={"param": "doe", "limit": 3}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 3
+    response = client.get("/utils/search", params={"param": "%"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.json() == []
+
+
+def test_upcoming_birthday_across_new_year(session, token, user):
+    current_user = session.query(User).filter_by(email=user.get('email')).first()
+
+    async def upcoming():
+        async with AsyncTestingSessionLocal() as db:
+            return await upcoming_birthday(current_user, db, days=5, today=date(2026, 12, 30))
+
+    contacts = asyncio.run(upcoming())
+    assert [contact.name for contact in contacts] == ["Name0", "Name1", "Name2"]
+
+
+def test_upcoming_birthday_days(client, token):
+    response = client.get("/utils/upcoming_birthday", params={"days": 366}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 11
+    response = client.get("/utils/upcoming_birthday", params={"days": 400}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 422, response.text
+
+
+def test_upcoming_birthday_etag(client, session, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/utils/upcoming_birthday", params={"days": 366}, headers=headers)
+    etag = response.headers["etag"]
+    response = client.get("/utils/upcoming_birthday", params={"days": 366}, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    contact = session.query(Contact).first()
+    contact.surname = 'Changed'
+    session.commit()
+    response = client.get("/utils/upcoming_birthday", params={"days": 366}, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_search_fast(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    slow = client.get("/utils/search", params={"param": "doe"}, headers=headers).json()
+    fast = client.get("/utils/search", params={"param": "doe", "fast": True}, headers=headers).json()
+    assert [contact["name"] for contact in fast] == [contact["name"] for contact in slow]
+    assert set(fast[0]) == {"id", "name", "surname", "email", "birthday"}
+    assert fast[0]["birthday"] == slow[0]["birthday"]
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_search_fields(client, token, fast):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/utils/search", params={"param": "doe", "fields": "email", "fast": fast}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert set(response.json()[0]) == {"id", "name", "email"}
+    response = client.get("/utils/search", params={"param": "doe", "fields": "data", "fast": fast}, headers=headers)
+    assert response.json()[0]["data"] == 'notes, "quoted"'
+
+
+def test_search_unknown_field(client, token):
+    response = client.get("/utils/search", params={"param": "doe", "fields": "password"},
+                          headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400, response.text
+
+
+def test_get_contact_has_data(client, token):
+    response = client.get("/contacts/get_contatact", params={"name": "Name1"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert response.json()["data"] == 'notes, "quoted"'
+
+
+@pytest.fixture(scope="module")
+def batch_contacts(session, token, user):
+    current_user = session.query(User).filter_by(email=user.get('email')).first()
+    contacts = [Contact(name=f'Batch{number}', surname='Doe', email=f'batch{number}@example.com',
+                        birthday=date(1990, 6, number + 1), user=current_user.id) for number in range(3)]
+    session.add_all(contacts)
+    session.commit()
+    return [contact.id for contact in contacts]
+
+
+def test_batch_get_one_query(client, token, batch_contacts):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM "Contacts"' in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = client.post("/contacts/batch_get", json={"keys": ["Batch0", batch_contacts[1], "Missing", 0]},
+                               headers={"Authorization": f"Bearer {token}"})
+    finally:
+        event.remove(async_engine.sync_engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [item["status"] for item in data] == [200, 200, 404, 404]
+    assert data[0]["contact"]["name"] == "Batch0"
+    assert data[1]["contact"]["id"] == batch_contacts[1]
+    assert len(statements) == 1
+
+
+def test_batch_update(client, session, token, batch_contacts):
+    contact = {"name": "Batch0", "surname": "Changed", "email": "batch0@example.com", "birthday": "1990-06-01",
+               "data": "x"}
+    response = client.put("/contacts/batch_update",
+                          json={"items": [{"key": batch_contacts[0], "contact": contact},
+                                          {"key": "Missing", "contact": contact}]},
+                          headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert [item["status"] for item in response.json()] == [200, 404]
+    session.expire_all()
+    assert session.get(Contact, batch_contacts[0]).surname == "Changed"
+    response = client.put("/contacts/batch_update", json={"items": [{"key": batch_contacts[0], "contact": contact}]},
+                          headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 429, response.text
+
+
+def test_batch_delete(client, session, token, batch_contacts):
+    response = client.post("/contacts/batch_delete", json={"keys": ["Batch1", batch_contacts[2], "Batch1x"]},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert [item["status"] for item in response.json()] == [200, 200, 404]
+    session.expire_all()
+    assert session.get(Contact, batch_contacts[1]) is None
+    assert session.get(Contact, batch_contacts[2]) is None
+    assert session.get(Contact, batch_contacts[0]) is not None
+
+
+def test_batch_too_many_keys(client, token):
+    response = client.post("/contacts/batch_get", json={"keys": list(range(501))},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 422, response.text
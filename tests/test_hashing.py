@@ -0,0 +1,38 @@
+import unittest
+
+from fastapi import HTTPException
+
+from src.repositories.hashing import HashPool
+
+
+class TestHashPool(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.pool = HashPool(kind='thread', workers=1, queue_size=2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.pool.get_hash('1234')
+        self.assertTrue(await self.pool.verify('1234', hashed))
+        self.assertFalse(await self.pool.verify('4321', hashed))
+        stats = self.pool.stats()
+        self.assertEqual(stats['completed'], 3)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreater(stats['hash_seconds_total'], 0)
+
+    async def test_queue_is_full(self):
+        self.pool.depth = self.pool.queue_size
+        with self.assertRaises(HTTPException) as error:
+            await self.pool.get_hash('1234')
+        self.assertEqual(error.exception.status_code, 503)
+        self.assertEqual(self.pool.stats()['rejected'], 1)
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            HashPool(kind='gpu')
+
+
+if __name__ == '__main__':
+    unittest.main()
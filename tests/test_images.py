@@ -0,0 +1,138 @@
+import io
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cloudinary
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from src.repositories.images import AVATAR_MAX_BYTES, AvatarPipeline, AvatarStorage, CloudinaryStorage, LocalStorage, \
+    UploadLimitMiddleware, avatar_pipeline, read_limited, resize_avatar
+
+
+def make_image(width: int = 1200, height: int = 800, mode: str = 'RGBA', format: str = 'PNG') -> bytes:
+    out = io.BytesIO()
+    Image.new(mode, (width, height), (200, 10, 10, 128) if mode == 'RGBA' else (200, 10, 10)).save(out, format=format)
+    return out.getvalue()
+
+
+class TestResizeAvatar(unittest.TestCase):
+
+    def test_square_jpeg(self):
+        data = resize_avatar(make_image())
+        image = Image.open(io.BytesIO(data))
+        self.assertEqual(image.size, (250, 250))
+        self.assertEqual(image.format, 'JPEG')
+
+    def test_not_an_image(self):
+        with self.assertRaises(ValueError):
+            resize_avatar(b'not an image')
+
+
+class TestAvatarPipeline(unittest.IsolatedAsyncioTestCase):
+
+    async def test_read_limited(self):
+        self.assertEqual(await read_limited(UploadFile(io.BytesIO(b'x' * 10)), limit=10), b'x' * 10)
+        with self.assertRaises(HTTPException) as err:
+            await read_limited(UploadFile(io.BytesIO(b'x' * 11)), limit=10)
+        self.assertEqual(err.exception.status_code, 413)
+
+    async def test_process_uploads_resized(self):
+        pipeline = AvatarPipeline(CloudinaryStorage())
+        original = make_image(1200, 1000, mode='RGB', format='BMP')
+        with patch('src.repositories.images.cloudinary.uploader.upload', return_value={'version': 7}) as upload, \
+                patch.object(cloudinary.config(), 'cloud_name', 'demo'):
+            url = await pipeline.process(UploadFile(io.BytesIO(original)), 'ContactApp/test@example.com')
+        uploaded = upload.call_args.args[0]
+        self.assertEqual(Image.open(io.BytesIO(uploaded)).size, (250, 250))
+        self.assertIn('w_250', url)
+        self.assertIn('v7', url)
+        stats = pipeline.stats()
+        self.assertEqual(stats['uploads'], 1)
+        self.assertLess(stats['bytes_out'], stats['bytes_in'] / 10)
+
+    async def test_process_rejects_invalid(self):
+        pipeline = AvatarPipeline(CloudinaryStorage())
+        with patch('src.repositories.images.cloudinary.uploader.upload') as upload:
+            with self.assertRaises(HTTPException) as err:
+                await pipeline.process(UploadFile(io.BytesIO(b'not an image')), 'ContactApp/test@example.com')
+        self.assertEqual(err.exception.status_code, 400)
+        upload.assert_not_called()
+        self.assertEqual(pipeline.stats()['rejected'], 1)
+
+
+class TestUploadLimitMiddleware(unittest.IsolatedAsyncioTestCase):
+
+    async def test_body_without_content_length_is_counted(self):
+        chunks = [{"type": "http.request", "body": b'x' * 6, "more_body": True},
+                  {"type": "http.request", "body": b'x' * 6, "more_body": False}]
+        received = []
+
+        async def receive():
+            return chunks.pop(0)
+
+        async def app(scope, receive, send):
+            while True:
+                received.append(await receive())
+
+        middleware = UploadLimitMiddleware(app, {('PATCH', '/users/avatar'): 10})
+        scope = {"type": "http", "method": "PATCH", "path": "/users/avatar", "headers": []}
+        with self.assertRaises(HTTPException) as err:
+            await middleware(scope, receive, None)
+        self.assertEqual(err.exception.status_code, 413)
+        self.assertEqual(len(received), 1)
+
+
+class TestAvatarStorage(unittest.TestCase):
+
+    def test_backend_without_save_fails_on_creation(self):
+        class NoSave(AvatarStorage):
+            name = 'nosave'
+
+        with self.assertRaises(TypeError):
+            NoSave()
+
+
+class TestLocalStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.root.name, base_url='/users/avatars/')
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_content_addressed(self):
+        data = resize_avatar(make_image())
+        url = self.storage.save(data, 'ContactApp/one@example.com')
+        name = url.rsplit('/', 1)[1]
+        self.assertTrue(url.startswith('/users/avatars/'))
+        self.assertEqual(self.storage.path(name).read_bytes(), data)
+
+    def test_dedup(self):
+        data = resize_avatar(make_image())
+        first = self.storage.save(data, 'ContactApp/one@example.com')
+        second = self.storage.save(data, 'ContactApp/two@example.com')
+        self.assertEqual(first, second)
+        self.assertEqual(self.storage.stats(), {"storage": "local", "stored": 1, "deduplicated": 1})
+
+
+def test_get_avatar(client):
+    with tempfile.TemporaryDirectory() as root, patch.object(avatar_pipeline, 'storage', LocalStorage(root)):
+        url = avatar_pipeline.storage.save(resize_avatar(make_image()), 'ContactApp/one@example.com')
+        response = client.get(url)
+        assert response.status_code == 200, response.text
+        assert response.headers['content-type'] == 'image/jpeg'
+        assert 'immutable' in response.headers['cache-control']
+        etag = response.headers['etag']
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert client.get('/users/avatars/' + '0' * 64 + '.jpg').status_code == 404
+        assert client.get('/users/avatars/..%2Fsecret.jpg').status_code == 404
+
+
+def test_upload_too_big_rejected_before_parsing(client):
+    # no token: the size check answers before the form is parsed and the user is authenticated
+    response = client.patch('/users/avatar', files={'file': ('big.png', b'x' * (AVATAR_MAX_BYTES + 100 * 1024))})
+    assert response.status_code == 413, response.text
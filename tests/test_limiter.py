@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import patch
+
+import fakeredis.aioredis
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.repositories.limiter import HybridRateLimiter
+
+
+def make_request(ip: str = '1.2.3.4', path: str = '/get_all_contatact') -> Request:
+    return Request({'type': 'http', 'method': 'GET', 'path': path, 'headers': [], 'client': (ip, 1)})
+
+
+class TestHybridRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    def tearDown(self):
+        HybridRateLimiter.redis = None
+
+    async def hit(self, limiter, request=None) -> bool:
+        try:
+            await limiter(request or make_request())
+        except HTTPException as err:
+            self.assertEqual(err.status_code, 429)
+            self.assertIn('Retry-After', err.headers)
+            return False
+        return True
+
+    async def test_local_limit_without_redis(self):
+        limiter = HybridRateLimiter(times=2, seconds=60)
+        results = [await self.hit(limiter) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertTrue(await self.hit(limiter, make_request(ip='5.6.7.8')))
+        self.assertEqual(limiter.stats()['syncs'], 0)
+
+    async def test_exact_limit_across_workers(self):
+        HybridRateLimiter.init(self.redis)
+        workers = [HybridRateLimiter(times=3, seconds=60), HybridRateLimiter(times=3, seconds=60)]
+        results = [await self.hit(workers[number % 2]) for number in range(6)]
+        self.assertEqual(results.count(True), 3)
+
+    async def test_batched_sync(self):
+        HybridRateLimiter.init(self.redis)
+        limiter = HybridRateLimiter(times=10, seconds=60, max_unsynced=5, sync_interval=60)
+        for _ in range(10):
+            self.assertTrue(await self.hit(limiter))
+        self.assertEqual(limiter.stats()['syncs'], 2)
+        self.assertFalse(await self.hit(limiter))
+
+    async def test_overshoot_bound(self):
+        HybridRateLimiter.init(self.redis)
+        workers = [HybridRateLimiter(times=4, seconds=60, max_unsynced=2, sync_interval=60) for _ in range(2)]
+        allowed = 0
+        for _ in range(4):
+            for worker in workers:
+                allowed += await self.hit(worker)
+        self.assertLessEqual(allowed, 4 + len(workers) * (2 - 1))
+
+    async def test_refill(self):
+        limiter = HybridRateLimiter(times=1, seconds=5)
+        with patch('src.repositories.limiter.time.monotonic', return_value=100):
+            self.assertTrue(await self.hit(limiter))
+            self.assertFalse(await self.hit(limiter))
+        with patch('src.repositories.limiter.time.monotonic', return_value=105):
+            self.assertTrue(await self.hit(limiter))
+
+    async def test_read_route_syncs_in_batches(self):
+        HybridRateLimiter.init(self.redis)
+        exact = HybridRateLimiter(times=12, seconds=60)
+        batched = HybridRateLimiter(times=12, seconds=60, max_unsynced=3, sync_interval=20)
+        with patch('src.repositories.limiter.time.monotonic', return_value=100), \
+                patch('src.repositories.limiter.time.time', return_value=100):
+            for _ in range(12):
+                self.assertTrue(await self.hit(exact))
+                self.assertTrue(await self.hit(batched, make_request(path='/batched')))
+        self.assertEqual(exact.stats()['syncs'], 12)
+        self.assertEqual(batched.stats()['syncs'], 4)
+
+    async def test_combined_limit_across_workers(self):
+        HybridRateLimiter.init(self.redis)
+        workers = [HybridRateLimiter(times=12, seconds=60, max_unsynced=3, sync_interval=20) for _ in range(2)]
+        allowed = 0
+        with patch('src.repositories.limiter.time.monotonic', return_value=100), \
+                patch('src.repositories.limiter.time.time', return_value=100):
+            for number in range(40):
+                allowed += await self.hit(workers[number % 2])
+        self.assertGreaterEqual(allowed, 12)
+        self.assertLessEqual(allowed, 12 + len(workers) * (3 - 1))
+
+    async def test_unsynced_hits_pushed_to_their_window(self):
+        HybridRateLimiter.init(self.redis)
+        limiter = HybridRateLimiter(times=12, seconds=60, max_unsynced=3, sync_interval=20)
+        with patch('src.repositories.limiter.time.monotonic', return_value=100), \
+                patch('src.repositories.limiter.time.time', return_value=100):
+            self.assertTrue(await self.hit(limiter))
+            self.assertTrue(await self.hit(limiter))
+        with patch('src.repositories.limiter.time.monotonic', return_value=130), \
+                patch('src.repositories.limiter.time.time', return_value=130):
+            self.assertTrue(await self.hit(limiter))
+            keys = await self.redis.keys('limiter:*')
+            self.assertEqual(len(keys), 1)
+            self.assertTrue(keys[0].endswith(':1'))
+            self.assertEqual(await self.redis.get(keys[0]), '2')
+
+    def test_wrong_arguments(self):
+        with self.assertRaises(ValueError):
+            HybridRateLimiter(times=0, seconds=5)
+        with self.assertRaises(ValueError):
+            HybridRateLimiter(times=1, seconds=5, max_unsynced=5)
+        with self.assertRaises(ValueError):
+            HybridRateLimiter(times=10, seconds=5, sync_interval=30)
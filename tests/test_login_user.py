@@ -1,6 +1,7 @@
 from unittest.mock import MagicMock
 
-from src.database.models import User
+from src.database.models import RefreshToken, User
+from src.repositories.auth import hash_token
 
 
 def test_create_user(client, user, monkeypatch):
@@ -58,3 +59,23 @@ def test_login_wrong_email(client, user):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == "Invalid email"
+
+
+def test_refresh_token_rotation(client, session, user):
+    response = client.post(
+        "/utils/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    tokens = response.json()
+    stored = session.query(RefreshToken).filter_by(token_hash=hash_token(tokens["refresh_token"])).first()
+    assert stored is not None
+    response = client.get("/utils/refresh_token", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 200, response.text
+    new_tokens = response.json()
+    assert new_tokens["refresh_token"] != tokens["refresh_token"]
+    response = client.get("/utils/refresh_token", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401, response.text
+    response = client.get("/utils/refresh_token", headers={"Authorization": f"Bearer {new_tokens['access_token']}"})
+    assert response.status_code == 401, response.text
+    response = client.get("/utils/refresh_token", headers={"Authorization": f"Bearer {new_tokens['refresh_token']}"})
+    assert response.status_code == 200, response.text
@@ -0,0 +1,96 @@
+import socket
+import unittest
+from email.message import EmailMessage
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig
+
+from src.repositories.mailer import MailWorker
+
+
+class Handler:
+
+    def __init__(self):
+        self.messages = []
+        self.answers = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.answers:
+            return self.answers.pop(0)
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_message(number: int = 0) -> EmailMessage:
+    message = EmailMessage()
+    message['To'] = f'user{number}@example.com'
+    message['Subject'] = 'Confirm your email '
+    message.set_content('<p>hello</p>', subtype='html')
+    return message
+
+
+class TestMailWorker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.handler = Handler()
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=free_port())
+        self.controller.start()
+        self.conf = ConnectionConfig(
+            MAIL_USERNAME='a@example.com', MAIL_PASSWORD='x', MAIL_FROM='a@example.com',
+            MAIL_PORT=self.controller.port, MAIL_SERVER='127.0.0.1', MAIL_STARTTLS=False, MAIL_SSL_TLS=False,
+            USE_CREDENTIALS=False, MAIL_FROM_NAME='Example email',
+        )
+
+    def tearDown(self):
+        self.controller.stop()
+
+    async def test_batch_over_one_connection(self):
+        worker = MailWorker(self.conf, connections=1, batch_size=20)
+        worker.start()
+        for number in range(10):
+            self.assertTrue(await worker.send(make_message(number)))
+        await worker.stop()
+        self.assertEqual(len(self.handler.messages), 10)
+        self.assertEqual(self.handler.messages[0].mail_from, 'a@example.com')
+        stats = worker.stats()
+        self.assertEqual(stats['sent'], 10)
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['batches'], 1)
+        self.assertGreater(stats['messages_per_second'], 0)
+
+    async def test_send_without_workers(self):
+        worker = MailWorker(self.conf)
+        self.assertTrue(await worker.send(make_message()))
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertEqual(worker.stats()['queued'], 0)
+
+    async def test_retry_temporary_failure(self):
+        self.handler.answers = ['451 Try again later', '451 Try again later']
+        worker = MailWorker(self.conf, backoff=0)
+        self.assertTrue(await worker.send(make_message()))
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertEqual(worker.stats()['retries'], 2)
+        self.assertEqual(worker.stats()['connects'], 3)
+
+    async def test_permanent_failure_not_retried(self):
+        self.handler.answers = ['550 No such user']
+        worker = MailWorker(self.conf, backoff=0)
+        self.assertFalse(await worker.send(make_message()))
+        self.assertEqual(self.handler.messages, [])
+        self.assertEqual(worker.stats()['failed'], 1)
+        self.assertEqual(worker.stats()['retries'], 0)
+
+    async def test_queue_full(self):
+        worker = MailWorker(self.conf, connections=1, queue_size=1)
+        worker.start()
+        self.assertTrue(await worker.send(make_message(1)))
+        self.assertFalse(await worker.send(make_message(2)))
+        await worker.stop()
+        self.assertEqual(worker.stats()['dropped'], 1)
+        self.assertEqual(len(self.handler.messages), 1)
@@ -0,0 +1,66 @@
+import unittest
+
+import fakeredis
+from fakeredis.aioredis import FakeAsyncRedisConnection
+
+from src import metrics
+from src.database.redis_pool import RedisPool
+from src.metrics import Counter, Histogram, Registry
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_counter(self):
+        counter = Counter('requests_total', 'Requests.', ('route',))
+        counter.inc(('/a',))
+        counter.inc(('/a',), 2)
+        counter.inc(('/b"',))
+        text = counter.render()
+        self.assertIn('# TYPE requests_total counter\n', text)
+        self.assertIn('requests_total{route="/a"} 3\n', text)
+        self.assertIn('requests_total{route="/b\\""} 1\n', text)
+
+    def test_histogram(self):
+        histogram = Histogram('latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('/a',), value)
+        text = histogram.render()
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 2\n', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1.0"} 3\n', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 4\n', text)
+        self.assertIn('latency_seconds_sum{route="/a"} 3.65\n', text)
+        self.assertIn('latency_seconds_count{route="/a"} 4\n', text)
+
+    def test_collect_stats(self):
+        registry = Registry()
+        registry.collect_stats('pool', ('name',), lambda: [(('main',), {"in_use": 3, "storage": 'local'})])
+        text = registry.render()
+        self.assertIn('pool_in_use{name="main"} 3.0\n', text)
+        self.assertNotIn('storage', text)
+
+
+class TestRedisMetrics(unittest.IsolatedAsyncioTestCase):
+
+    async def test_commands_timed(self):
+        redis_pool = RedisPool()
+        client = redis_pool.open(connection_class=FakeAsyncRedisConnection, server=fakeredis.FakeServer())
+        before = metrics.redis_duration._values.get(('SET',), [None, 0.0, 0])[2]
+        await client.set('key', 'value')
+        async with client.pipeline() as pipe:
+            await pipe.incr('counter').expire('counter', 10).execute()
+        await redis_pool.close()
+        self.assertEqual(metrics.redis_duration._values[('SET',)][2], before + 1)
+        self.assertIn(('PIPELINE',), metrics.redis_duration._values)
+
+
+def test_metrics_endpoint(client):
+    response = client.get('/users/avatars/' + '0' * 64 + '.jpg')
+    assert response.status_code == 404
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'http_requests_total{method="GET",route="/users/avatars/{name}",status="404"}' in response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/users/avatars/{name}"}' in response.text
+    assert '0' * 64 not in response.text
+    assert 'rate_limiter_allowed{route="/contacts/get_all_contatact"}' in response.text
+    assert 'hash_pool_workers' in response.text
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from src.database.models import User
+from src.repositories import operations
+from tests.conftest import AsyncTestingSessionLocal, async_engine
+
+
+@pytest.fixture(scope="module")
+def current_user(session):
+    user = User(email='plans@example.com', password='1234')
+    session.add(user)
+    session.commit()
+    return user
+
+
+def query_plan(session, call):
+    """Run repository call, capture its first SELECT and return SQLite EXPLAIN QUERY PLAN for it."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    async def run():
+        async with AsyncTestingSessionLocal() as db:
+            await call(db)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        asyncio.run(run())
+    finally:
+        event.remove(async_engine.sync_engine, 'before_cursor_execute', capture)
+    statement, parameters = statements[0]
+    rows = session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return ' '.join(row[-1] for row in rows)
+
+
+def test_get_one_contact_uses_user_name_index(session, current_user):
+    plan = query_plan(session, lambda db: operations.get_one_contact('John', current_user, db))
+    assert 'ix_Contacts_user_name_id' in plan
+
+
+def test_contacts_page_uses_user_name_index(session, current_user):
+    plan = query_plan(session, lambda db: operations.get_contacts_page(current_user, db, limit=10))
+    assert 'ix_Contacts_user_name_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_upcoming_birthday_uses_month_day_index(session, current_user):
+    plan = query_plan(session, lambda db: operations.upcoming_birthday(current_user, db, days=7,
+                                                                       today=date(2026, 6, 10)))
+    assert 'ix_Contacts_user_birthday_md (user=? AND <expr>>? AND <expr><?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_upcoming_birthday_across_new_year_seeks_month_day(session, current_user):
+    plan = query_plan(session, lambda db: operations.upcoming_birthday(current_user, db, days=7,
+                                                                       today=date(2026, 12, 29)))
+    assert 'ix_Contacts_user_birthday_md (user=? AND <expr>>?)' in plan
+    assert 'ix_Contacts_user_birthday_md (user=? AND <expr><?)' in plan
+
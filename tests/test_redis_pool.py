@@ -0,0 +1,45 @@
+import unittest
+
+import fakeredis
+from fakeredis.aioredis import FakeAsyncRedisConnection
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.database.redis_pool import RedisPool
+
+
+class TestRedisPool(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis_pool = RedisPool(max_connections=2, timeout=0.05)
+        self.client = self.redis_pool.open(connection_class=FakeAsyncRedisConnection, server=fakeredis.FakeServer())
+
+    async def asyncTearDown(self):
+        await self.redis_pool.close()
+
+    async def test_shared_client(self):
+        self.assertIs(self.redis_pool.open(), self.client)
+        self.assertTrue(await self.redis_pool.ping())
+        await self.client.set('key', 'value')
+        self.assertEqual(await self.client.get('key'), 'value')
+        stats = self.redis_pool.stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['acquired'], 3)
+
+    async def test_pool_exhausted(self):
+        first = await self.redis_pool.pool.get_connection('GET')
+        second = await self.redis_pool.pool.get_connection('GET')
+        self.assertEqual(self.redis_pool.stats()['utilization'], 1.0)
+        with self.assertRaises(RedisConnectionError):
+            await self.client.get('key')
+        self.assertEqual(self.redis_pool.stats()['timeouts'], 1)
+        await self.redis_pool.pool.release(first)
+        self.assertEqual(self.redis_pool.stats()['in_use'], 1)
+        await self.redis_pool.pool.release(second)
+        self.assertIsNone(await self.client.get('key'))
+
+    async def test_close(self):
+        await self.client.ping()
+        await self.redis_pool.close()
+        self.assertIsNone(self.redis_pool.client)
+        self.assertEqual(self.redis_pool.stats(), {})
+        await self.redis_pool.close()
@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.repositories.email import conf
+from src.repositories.rendering import TemplateRegistry
+
+
+class TestTemplateRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.registry = TemplateRegistry(conf.TEMPLATE_FOLDER, cache_dir=self.cache_dir.name)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_same_body_as_fastapi_mail(self):
+        expected = conf.template_engine().get_template("example_email.html").render(host="http://h/", token="t")
+        self.assertEqual(self.registry.render("example_email.html", host="http://h/", token="t"), expected)
+
+    def test_compiled_once(self):
+        self.registry.load()
+        with patch.object(self.registry.env, 'get_template') as get_template:
+            self.registry.render("example_email.html", host="h", token="t")
+            self.registry.render("example_email.html", host="h", token="t")
+        get_template.assert_not_called()
+        self.assertEqual(self.registry.stats()["templates"], 1)
+        self.assertEqual(self.registry.stats()["renders"], 2)
+
+    def test_bytecode_cache(self):
+        self.registry.load()
+        self.assertTrue(list(Path(self.cache_dir.name).iterdir()))
+
+    def test_render_many(self):
+        bodies = self.registry.render_many("example_email.html", [{"token": "one"}, {"token": "two"}], host="http://h/")
+        self.assertEqual(len(bodies), 2)
+        self.assertIn("http://h/utils/confirmed_email/one", bodies[0])
+        self.assertIn("http://h/utils/confirmed_email/two", bodies[1])
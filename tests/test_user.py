@@ -1,7 +1,7 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.repositories.operations import signup, update_avatar, confirmed_email
@@ -10,9 +10,10 @@ from src.schemas import UserModel
 class TestUsers(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=193, email='test@gmail.com', password='1234',
-                         access_token=None, refresh_token=None,
                          confirmed=False, avatar='qweqweq')
 
 
@@ -20,7 +21,7 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
 
     async def test_signup(self):
         body = UserModel(email='test2@gmail.com', password=self.user.password)
-        self.session.query().filter_by().first.return_value = None
+        self.result.scalars().first.return_value = None
         result = await signup(body=body, db=self.session)
         self.assertEqual(result.email, body.email)
 
@@ -35,10 +36,9 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
 
     async def test_update_avatar(self):
         # user = User()
-        self.session.query().filter_by().first.return_value = self.user
+        self.result.scalars().first.return_value = self.user
         url = 'new_url'
         expected_user = User(id=123, email='test@gmail.com', password='1234',
-                             access_token=None, refresh_token=None,
                              confirmed=False, avatar='qweqweq')
         self.session.commit.return_value = None
         result = await update_avatar(self.user.email, url, self.session)
@@ -46,7 +46,7 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(expected_user.email, result.email)
 
     async def test_email_confirmed(self):
-        self.session.query().filter_by().first.return_value = self.user
+        self.result.scalars().first.return_value = self.user
         result = await confirmed_email(self.user.email, self.session)
         self.assertIsNone(result)
 